@@ -0,0 +1,313 @@
+import numpy as np
+import pandas as pd
+
+from backends import get_backend
+from features import DATE_SUFFIXES, DAY_NAMES, ensure_columns
+
+# Categorical dimensions every count-based chart is drawn from
+CUBE_DIMENSIONS = ['aseguradora', 'estado', 'franja_horaria', 'recomendacion', 'age_group', 'persona_genero']
+
+# Numeric columns kept as value counts, with the dimensions they are split by
+NUMERIC_COUNTS = {
+    'persona_edad': ['aseguradora', 'recomendacion'],
+    'horas_primer_contacto': ['aseguradora'],
+}
+
+# Date columns rolled up for the trend views, and the dimensions their daily counts are split by
+TREND_DATES = list(DATE_SUFFIXES)
+TREND_DIMENSIONS = ['aseguradora', 'estado']
+
+# Bumped when DatasetAggregates gains a rollup, so aggregates cached by an older release are rebuilt
+AGGREGATES_VERSION = 2
+
+
+def group_counts(df, columns, backend=None, weights=None, dropna=False):
+    """Rows per observed combination of ``columns``, counted by the aggregation backend.
+
+    ``weights`` names a column of per-row weights (on a weighted sample each
+    row stands for several); groups then get their weight sum, a float.
+    """
+    if weights is None:
+        return get_backend(backend).group_counts(df, columns, dropna)
+    return df.groupby(list(columns), observed=True, dropna=dropna)[weights].sum().rename('count')
+
+
+def build_count_cube(df, dimensions=CUBE_DIMENSIONS, backend=None, weights=None):
+    """Count rows for every observed combination of ``dimensions`` (nulls included)."""
+    dimensions = [col for col in dimensions if col in df.columns]
+    return group_counts(df, dimensions, backend, weights)
+
+
+def marginal_counts(cube, dimensions):
+    """Roll the cube up to ``dimensions``, dropping null categories like a row-level groupby would."""
+    dimensions = list(dimensions)
+    counts = cube.groupby(level=dimensions, observed=True, dropna=True).sum()
+    counts = counts[counts > 0]
+    return counts.reset_index(name='count')
+
+
+def build_value_counts(df, column, by, backend=None, weights=None):
+    """Count rows per distinct value of a numeric ``column`` within each ``by`` group."""
+    by = [col for col in by if col in df.columns]
+    return group_counts(df, by + [column], backend, weights)
+
+
+def _dated(df, date_col, columns):
+    """Non-null ``date_col`` values and the matching rows of ``columns`` (``None`` entries are skipped)."""
+    dates = df[date_col].dropna()
+    return dates, {col: df.loc[dates.index, col] for col in columns if col is not None}
+
+
+def build_daily_counts(df, date_col, by=TREND_DIMENSIONS, backend=None, weights=None):
+    """Count rows per calendar day of ``date_col`` (``dia``) within each ``by`` group; undated rows are left out."""
+    by = [col for col in by if col in df.columns]
+    dates, columns = _dated(df, date_col, [*by, weights])
+    days = pd.DataFrame({'dia': dates.dt.normalize(), **columns})
+    return group_counts(days, ['dia', *by], backend, weights)
+
+
+def build_hour_counts(df, date_col, backend=None, weights=None):
+    """Count rows per weekday (0 is Monday) and hour of ``date_col``; undated rows are left out."""
+    dates, columns = _dated(df, date_col, [weights])
+    hours = pd.DataFrame({'dia_semana': dates.dt.dayofweek, 'hora': dates.dt.hour, **columns})
+    return group_counts(hours, ['dia_semana', 'hora'], backend, weights)
+
+
+def _rollup(value_counts, levels):
+    counts = value_counts.groupby(level=list(levels), observed=True, dropna=True).sum()
+    return counts[counts > 0]
+
+
+def bin_edges(values, weights, bins, binning='fixed'):
+    """Bin edges for weighted ``values``: equal width ('fixed') or equal frequency ('adaptive')."""
+    low, high = values.min(), values.max()
+    if low == high:
+        return np.array([low - 0.5, high + 0.5])
+    if binning == 'adaptive':
+        order = np.argsort(values)
+        cumulative = np.cumsum(weights[order]) / weights.sum()
+        edges = np.interp(np.linspace(0, 1, bins + 1), np.concatenate([[0], cumulative]),
+                          np.concatenate([[low], values[order]]))
+        return np.unique(edges)
+    if np.all(values % 1 == 0):
+        # Integer-aligned bins (e.g. ages) so no bin straddles a different number of values
+        width = max(1, int(np.ceil((high - low + 1) / bins)))
+        return np.arange(low - 0.5, high + 0.5 + width, width)
+    return np.linspace(low, high, bins + 1)
+
+
+def bin_counts(value_counts, column, by, bins, binning='fixed'):
+    """Aggregate value counts into histogram bins per ``by`` group."""
+    counts = _rollup(value_counts, [*by, column])
+    if counts.empty:
+        return pd.DataFrame(columns=[*by, 'bin_start', 'bin_end', 'count'])
+
+    values = counts.index.get_level_values(column).to_numpy(dtype='float64')
+    weights = counts.to_numpy()
+    edges = bin_edges(values, weights, bins, binning)
+    positions = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+
+    frame = counts.reset_index(name='count').drop(columns=column)
+    frame['bin'] = positions
+    binned = frame.groupby([*by, 'bin'], observed=True)['count'].sum().reset_index()
+    binned = binned[binned['count'] > 0]
+    binned['bin_start'] = edges[binned['bin']]
+    binned['bin_end'] = edges[binned['bin'] + 1]
+    return binned.drop(columns='bin').reset_index(drop=True)
+
+
+def _weighted_quantile(values, cumulative, q):
+    # Linear interpolation between the ranks around q * (n - 1), as np.quantile does
+    position = q * (cumulative[-1] - 1)
+    lower = values[np.searchsorted(cumulative, np.floor(position), side='right')]
+    upper = values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+    return lower + (upper - lower) * (position - np.floor(position))
+
+
+def box_stats(value_counts, column, by):
+    """Quartiles and Tukey fences of ``column`` per ``by`` group, computed from value counts."""
+    counts = _rollup(value_counts, [*by, column])
+    rows = []
+    for key, group in counts.groupby(level=list(by), observed=True):
+        values = group.index.get_level_values(column).to_numpy(dtype='float64')
+        order = np.argsort(values)
+        values = values[order]
+        cumulative = np.cumsum(group.to_numpy()[order])
+
+        q1, median, q3 = (_weighted_quantile(values, cumulative, q) for q in (0.25, 0.5, 0.75))
+        iqr = q3 - q1
+        key = key if isinstance(key, tuple) else (key,)
+        rows.append({
+            **dict(zip(by, key)),
+            'q1': q1, 'median': median, 'q3': q3,
+            'lowerfence': values[values >= q1 - 1.5 * iqr].min(),
+            'upperfence': values[values <= q3 + 1.5 * iqr].max(),
+            'count': int(cumulative[-1]),
+        })
+    return pd.DataFrame(rows)
+
+
+def resample_counts(daily_counts, by, freq):
+    """Roll daily counts up to ``freq`` periods ('D', 'W' or 'M') per ``by`` group.
+
+    Returns one row per period (``periodo``, its first day) and one column per
+    group, with zeros for the periods a group has no rows in.
+    """
+    counts = _rollup(daily_counts, ['dia', *by]).reset_index(name='count')
+    if counts.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='periodo'))
+    periods = counts['dia'].dt.to_period(freq)
+    counts['periodo'] = periods.dt.start_time
+    table = counts.groupby(['periodo', *by], observed=True)['count'].sum()
+    table = table.unstack(by, fill_value=0) if by else table.to_frame()
+    full = pd.period_range(periods.min(), periods.max(), freq=freq).start_time
+    return table.reindex(full.rename('periodo'), fill_value=0)
+
+
+def weekday_hour_grid(hour_counts):
+    """Counts as a 7 x 24 frame: weekdays (by name) down, hours across."""
+    counts = _rollup(hour_counts, ['dia_semana', 'hora'])
+    grid = counts.unstack('hora', fill_value=0) if len(counts) else pd.DataFrame()
+    grid = grid.reindex(index=range(7), columns=range(24), fill_value=0)
+    grid.index = DAY_NAMES
+    return grid
+
+
+# Joins the labels of a hierarchy node and its ancestors into the node id. The
+# ASCII unit separator does not occur in category labels, unlike '/' or '-'
+NODE_SEPARATOR = '\x1f'
+
+
+def node_path(node_id):
+    """The labels of a hierarchy node and its ancestors, for display."""
+    return node_id.replace(NODE_SEPARATOR, ' › ')
+
+
+def build_hierarchy(cube, path):
+    """Every node of the ``path`` hierarchy with ``id``, ``parent``, ``label``, ``depth`` and ``count``.
+
+    Counts come from the full-depth marginal (rows with a null anywhere on the
+    path are left out), so each parent is exactly the sum of its children.
+    """
+    path = list(path)
+    leaves = marginal_counts(cube, path)
+    keys = leaves[path].astype(str)
+    ids = keys[path[0]]
+    levels = []
+    for depth, column in enumerate(path, start=1):
+        parents = ids if depth > 1 else pd.Series('', index=keys.index)
+        ids = keys[column] if depth == 1 else ids + NODE_SEPARATOR + keys[column]
+        level = pd.DataFrame({'id': ids, 'parent': parents, 'label': keys[column], 'count': leaves['count']})
+        level = level.groupby(['id', 'parent', 'label'], sort=False)['count'].sum().reset_index()
+        level['depth'] = depth
+        levels.append(level)
+    return pd.concat(levels, ignore_index=True)
+
+
+def sum_counts(left, right):
+    """Add two count series over the same levels, aligning on their index values."""
+    if left is None:
+        return right
+    levels = list(range(left.index.nlevels))
+    return pd.concat([left, right]).groupby(level=levels, observed=True, dropna=False).sum().rename('count')
+
+
+class DatasetAggregates:
+    """Pre-aggregated counts of a dataset, built once and shared by every chart."""
+
+    def __init__(self, cube, value_counts=None, n_rows=None, date_range=(pd.NaT, pd.NaT),
+                 daily_counts=None, hour_counts=None):
+        self.cube = cube
+        self.value_counts = value_counts or {}
+        # Per date column: rows per day and trend dimension, and rows per weekday and hour.
+        # Their size follows the number of days covered, not the number of rows
+        self.daily_counts = daily_counts or {}
+        self.hour_counts = hour_counts or {}
+        self.version = AGGREGATES_VERSION
+        self.n_rows = int(cube.sum()) if n_rows is None else n_rows
+        self.date_range = date_range  # (min, max) of fecha_alta
+
+    @classmethod
+    def from_frame(cls, df, backend=None, weights=None):
+        """Aggregate ``df`` with the given (or configured) aggregation backend.
+
+        ``weights`` names a column of per-row weights when ``df`` is a weighted
+        sample; every count is then an estimate for the rows it was drawn from.
+        """
+        ensure_columns(df, ['age_group'])
+        value_counts = {
+            column: build_value_counts(df, column, by, backend, weights)
+            for column, by in NUMERIC_COUNTS.items() if column in df.columns
+        }
+        dates = [col for col in TREND_DATES if col in df.columns]
+        daily_counts = {col: build_daily_counts(df, col, backend=backend, weights=weights) for col in dates}
+        hour_counts = {col: build_hour_counts(df, col, backend, weights) for col in dates}
+        date_range = (df['fecha_alta'].min(), df['fecha_alta'].max())
+        n_rows = len(df) if weights is None else int(round(df[weights].sum()))
+        return cls(build_count_cube(df, backend=backend, weights=weights), value_counts, n_rows, date_range,
+                   daily_counts, hour_counts)
+
+    def merge(self, other):
+        """Combine the aggregates of two disjoint sets of rows."""
+        value_counts = {
+            column: sum_counts(self.value_counts.get(column), counts)
+            for column, counts in other.value_counts.items()
+        }
+        date_range = (
+            pd.Series([self.date_range[0], other.date_range[0]]).min(),
+            pd.Series([self.date_range[1], other.date_range[1]]).max(),
+        )
+        daily_counts = {
+            column: sum_counts(self.daily_counts.get(column), counts)
+            for column, counts in other.daily_counts.items()
+        }
+        hour_counts = {
+            column: sum_counts(self.hour_counts.get(column), counts)
+            for column, counts in other.hour_counts.items()
+        }
+        return DatasetAggregates(sum_counts(self.cube, other.cube), value_counts,
+                                 self.n_rows + other.n_rows, date_range, daily_counts, hour_counts)
+
+    @property
+    def current(self):
+        """Whether these aggregates have every rollup of this release (older ones come from the cache)."""
+        return self.__dict__.get('version') == AGGREGATES_VERSION
+
+    @property
+    def dimensions(self):
+        return list(self.cube.index.names)
+
+    def covers(self, columns):
+        """Whether counts over ``columns`` can be served from the cube."""
+        return all(col in self.dimensions for col in columns)
+
+    def counts(self, *dimensions):
+        """Row counts per combination of ``dimensions`` as a DataFrame with a ``count`` column."""
+        return marginal_counts(self.cube, dimensions)
+
+    def hierarchy(self, *path):
+        """Nodes of the ``path`` hierarchy (see ``build_hierarchy``), built once per path."""
+        hierarchies = self.__dict__.setdefault('_hierarchies', {})
+        if path not in hierarchies:
+            hierarchies[path] = build_hierarchy(self.cube, path)
+        return hierarchies[path]
+
+    def distinct_counts(self, column):
+        """Row counts per distinct value of a numeric column."""
+        return _rollup(self.value_counts[column], [column]).reset_index(name='count')
+
+    def histogram(self, column, by, bins, binning='fixed'):
+        """Per-bin counts of a numeric column for each ``by`` group."""
+        return bin_counts(self.value_counts[column], column, list(by), bins, binning)
+
+    def box(self, column, by):
+        """Box-plot statistics of a numeric column for each ``by`` group."""
+        return box_stats(self.value_counts[column], column, list(by))
+
+    def trend(self, date_col, freq, by=()):
+        """Rows per ``freq`` period of ``date_col`` and ``by`` group (see ``resample_counts``)."""
+        return resample_counts(self.daily_counts[date_col], list(by), freq)
+
+    def weekday_hours(self, date_col):
+        """Rows per weekday and hour of ``date_col`` (see ``weekday_hour_grid``)."""
+        return weekday_hour_grid(self.hour_counts[date_col])
@@ -1,49 +1,255 @@
+import time
+
+# Taken before anything else is imported, so a cold run's imports count towards its budget
+RUN_START = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import plotly.io as pio
-from io import StringIO
-from visualizacion_1 import DataVisualizer  # Adjust the import based on your file structure
+import contextvars
+import importlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from aggregates import DatasetAggregates, node_path
+from cache import DatasetCache, FigureCache
+from dataset import load_dataset_async
+from filters import FilterIndex, filter_key, selection_size
+from report import build_report, get_kaleido_pool
+from sampling import WEIGHT, SampleAggregates, stratified_sample
+from tables import page, page_count, sort_order, to_csv_bytes
+from config import COLD_START_BUDGET_S, DEBUG_PANEL, PREVIEW_MODE, PREVIEW_SAMPLE_ROWS, TABLE_PAGE_SIZE, TABLE_TOP_N, TIMING_LOG
+from instrumentation import emit, first_run, run_records, start_run
 import os
 
-# Ensure kaleido is installed
-import kaleido
+# Plotly (via visualizacion_1) and kaleido are imported on first use: the
+# plotting stack is warmed up in the background, kaleido only loads for exports
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress updates while a dataset loads
+LOAD_POLL_S = 0.1
+
+@st.cache_resource
+def start_warm_up():
+    """Import the plotting stack in a background thread while the dataset loads."""
+    thread = threading.Thread(target=importlib.import_module, args=('visualizacion_1',),
+                              name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_resource(max_entries=4)
+def get_visualizer(fingerprint, _df, _aggregates=None, _date_range=None):
+    """One DataVisualizer per dataset (and filter selection), shared by every session.
+
+    Lazily derived columns survive reruns and are computed once for all users.
+    ``_df`` is a frame, or for a filter selection a function slicing it, so
+    the rows are only copied when the visualizer is not cached yet.
+    """
+    from visualizacion_1 import DataVisualizer
+
+    if callable(_df):
+        _df = _df()
+    sampled = _aggregates is not None and len(_df) < _aggregates.n_rows
+    return DataVisualizer(_df, fingerprint=fingerprint, figure_cache=get_figure_cache(),
+                          aggregates=_aggregates, sampled=sampled, date_range=_date_range)
+
+@st.cache_resource
+def get_exact_builder():
+    """Background thread computing exact results while their preview is on screen."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='exact')
+
+class ExactBuild:
+    """Background build of one selection's exact visualizer.
+
+    A session moving to another selection cancels its build if it has not
+    started yet; ``future`` submits it again for any session still waiting on it.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._future = None
+        self._lock = threading.Lock()
+
+    def future(self):
+        with self._lock:
+            if self._future is None or self._future.cancelled():
+                # Run in a copy of the caller's context so the timings stay tagged with its rerun
+                self._future = get_exact_builder().submit(contextvars.copy_context().run, self._build)
+            return self._future
+
+    def cancel(self):
+        with self._lock:
+            if self._future is not None:
+                self._future.cancel()
+
+@st.cache_resource(max_entries=4)
+def get_exact_visualizer(fingerprint, _select, _date_range=None):
+    """Build of the exact visualizer of a filtered selection, sliced and aggregated in the background."""
+    figure_cache = get_figure_cache()
+
+    def build():
+        from visualizacion_1 import DataVisualizer
+
+        # Every selected row is copied and aggregated here, off the script thread
+        df = _select()
+        aggregates = DatasetAggregates.from_frame(df)
+        return DataVisualizer(df, fingerprint=fingerprint, figure_cache=figure_cache,
+                              aggregates=aggregates, date_range=_date_range)
+
+    return ExactBuild(build)
+
+def supersede_exact_build(build):
+    """Make ``build`` (or ``None``) this session's pending exact build, cancelling the one it replaces."""
+    previous = st.session_state.get('exact_build')
+    if previous is not None and previous is not build:
+        # Only a build still queued is cancelled; one already running finishes
+        previous.cancel()
+    st.session_state['exact_build'] = build
+
+@st.cache_resource(max_entries=4)
+def get_preview_visualizer(fingerprint, _select, _date_range=None):
+    """Visualizer over a stratified sample of a filtered selection, shown until the exact one is ready."""
+    from visualizacion_1 import DataVisualizer
+
+    _df = _select()
+    sample, strata = stratified_sample(_df, PREVIEW_SAMPLE_ROWS)
+    aggregates = SampleAggregates.from_sample(sample, strata, (_df['fecha_alta'].min(), _df['fecha_alta'].max()))
+    return DataVisualizer(sample, fingerprint=f'{fingerprint}:preview', figure_cache=get_figure_cache(),
+                          aggregates=aggregates, date_range=_date_range, weights=WEIGHT)
+
+@st.cache_resource(max_entries=8)
+def get_sort_order(fingerprint, groupby_columns, sort_by, ascending, _groups):
+    """Display order of a grouped table, sorted once per grouping and order instead of on every page."""
+    return sort_order(_groups, sort_by, ascending)
+
+@st.cache_resource(max_entries=2)
+def get_filter_index(fingerprint, _df):
+    """Date-sorted frame and per-category row positions, built once per dataset."""
+    return FilterIndex(_df)
+
+@st.cache_resource
+def get_dataset_cache():
+    """Process-wide dataset cache shared by every rerun."""
+    return DatasetCache()
+
+@st.cache_resource
+def get_figure_cache():
+    """Process-wide LRU of built figures, keyed by view, parameters and dataset fingerprint."""
+    return FigureCache()
 
 def load_data():
     
     file_path = 'fake_data_grande.csv'
+    parquet_path = 'fake_data_grande.parquet'
     
-    if os.path.exists(file_path):
+    if os.path.exists(parquet_path):
+            # Prefer the typed columnar copy produced by `python ingestion.py`
+            uploaded_file = parquet_path
+            st.info("Using test dataset: fake_data_grande.parquet")
+    elif os.path.exists(file_path):
             # Load test data directly
             uploaded_file = file_path
             st.info("Using test dataset: fake_data_grande.csv")
     else:
-        uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
+        uploaded_file = st.file_uploader("Choose a data file", type=["csv", "parquet", "arrow", "feather"])
     
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file)
-
-            # Convert relevant columns to datetime
-            df['fecha_alta'] = pd.to_datetime(df['fecha_alta'], errors='coerce')
-            df['fecha_primer_contacto'] = pd.to_datetime(df['fecha_primer_contacto'], errors='coerce')
-            df['fecha_ultimo_estado'] = pd.to_datetime(df['fecha_ultimo_estado'], errors='coerce')
-            df['mes_alta'] = df['fecha_alta'].dt.month_name()
-            df['dia_semana_alta'] = df['fecha_alta'].dt.day_name()
-            df['hora_alta'] = df['fecha_alta'].dt.hour
-            df['mes_contacto'] = df['fecha_primer_contacto'].dt.month_name()
-            df['dia_semana_contacto'] = df['fecha_primer_contacto'].dt.day_name()
-            df['hora_contacto'] = df['fecha_primer_contacto'].dt.hour
-            df['mes_ultimo_estado'] = df['fecha_ultimo_estado'].dt.month_name()
-            df['dia_semana_ultimo_estado'] = df['fecha_ultimo_estado'].dt.day_name()
-            df['hora_ultimo_estado'] = df['fecha_ultimo_estado'].dt.hour
-            df['age_group'] = ['Menor de edad' if age < 18 else 'Adulto hasta 59' if age < 60 else '60+' for age in df['persona_edad']]
-            return df
+            # Loaded in the background; the page shell is already drawn, show progress until done
+            future, progress = load_dataset_async(uploaded_file, get_dataset_cache())
+            # The bar only appears for loads that outlast the first wait
+            if not wait([future], timeout=LOAD_POLL_S).done:
+                bar = st.progress(progress.fraction, text=progress.text)
+                while not wait([future], timeout=LOAD_POLL_S).done:
+                    bar.progress(progress.fraction, text=progress.text)
+                bar.empty()
+            df, key, meta = future.result()
+            if meta.get('streamed'):
+                # Too large for memory: only aggregates and a sample are kept
+                st.info(f"Streaming mode: {meta['aggregates'].n_rows:,} rows aggregated, "
+                        f"row-level views use a {len(df):,}-row sample.")
+            return df, key, meta.get('aggregates')
         except Exception as e:
             st.error(f"Error reading the file: {e}")
-            return pd.DataFrame()
+            return pd.DataFrame(), None, None
     else:
-        st.warning("Please upload a CSV file.")
-        return pd.DataFrame()
+        st.warning("Please upload a CSV, Parquet or Arrow file.")
+        return pd.DataFrame(), None, None
+
+# Sidebar label of every parameterless view, in DataVisualizer.VIEWS order
+VIEW_OPTIONS = {
+    'Distribución de aseguradoras': 'distribución_de_aseguradoras',
+    'Estado por aseguradora': 'estado_por_aseguradora',
+    'Aseguradora por franja horaria': 'aseguradora_por_franja_horaria',
+    'Distribución de edades': 'distribución_de_edades',
+    'Distribución de grupos de edades': 'distribución_groupo_de_edades',
+    'Primer contacto por aseguradora': 'primer_contacto_por_aseguradora',
+    'Distribución de recomendaciones por aseguradora': 'distribucion_de_recomendaciones_por_aseguradora',
+    'Recomendación Sunburst': 'recomendacion_sunburst',
+    'Tendencias': 'tendencias',
+    'Actividad por día y hora': 'actividad_por_dia_y_hora',
+}
+
+def render_figures(figures):
+    """Draw the figures a view returned, in order."""
+    for fig in figures:
+        st.plotly_chart(fig)
+
+def tablas_section(visualizer, groupby_columns):
+    """Capped chart, one sorted page of the grouped counts and an on-demand CSV export."""
+    top_n = st.slider('Groups per column in the chart', min_value=5, max_value=50, value=TABLE_TOP_N)
+    try:
+        figures, result_df = visualizer.tablas(groupby_columns, top_n)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    render_figures(figures)
+
+    sort_col, order_col, page_col = st.columns(3)
+    sort_by = sort_col.selectbox('Sort by', ['count'] + list(groupby_columns))
+    ascending = order_col.radio('Order', ['Descending', 'Ascending'], horizontal=True) == 'Ascending'
+    pages = page_count(len(result_df), TABLE_PAGE_SIZE)
+    number = page_col.number_input(f'Page (of {pages})', min_value=1, max_value=pages, value=1)
+
+    # Display one page of the table
+    order = get_sort_order(visualizer.fingerprint, tuple(groupby_columns), sort_by, ascending, result_df)
+    rows = page(result_df, number, TABLE_PAGE_SIZE, order)
+    st.dataframe(rows, hide_index=True)
+    st.caption(f'{len(result_df):,} groups')
+
+    # The CSV is only encoded when asked for, not on every rerun
+    if st.button('Prepare CSV download'):
+        st.download_button(
+            label="Download Table as CSV",
+            data=to_csv_bytes(result_df),
+            file_name=f'table_{groupby_columns}.csv',
+            mime='text/csv'
+        )
+
+def sunburst_section(visualizer):
+    """Sunburst of the first levels, with controls to drill into a node or climb back up."""
+    root = st.session_state.get('sunburst_root')
+    figures, drillable = visualizer.recomendacion_sunburst(root)
+    render_figures(figures)
+
+    # Keyed by the current root, so the selector starts empty after every drill
+    target = st.selectbox('Drill into', ['—'] + drillable, format_func=node_path, key=f'sunburst_drill_{root}')
+    if target != '—':
+        st.session_state['sunburst_root'] = target
+        st.rerun()
+    if root is not None and st.button('Up one level'):
+        st.session_state['sunburst_root'] = visualizer.sunburst_parent(root)
+        st.rerun()
+
+def tendencias_section(visualizer):
+    """Trend lines for the chosen date column and period."""
+    dates = [col for col in visualizer.TREND_DATES if col in visualizer.aggregates.daily_counts]
+    date_field, period_field = st.columns(2)
+    date_col = date_field.selectbox('Fecha', dates, format_func=visualizer.TREND_DATES.get)
+    freq = period_field.radio('Periodo', list(visualizer.TREND_PERIODS), index=1, horizontal=True,
+                            format_func=visualizer.TREND_PERIODS.get)
+    figures, _ = visualizer.tendencias(date_col, freq)
+    render_figures(figures)
 
 def to_csv(df):
     """Convert DataFrame to CSV."""
@@ -52,35 +258,136 @@ def to_csv(df):
 def export_plot_as_png(fig):
     """Converts Plotly figure to PNG and returns the binary data."""
     if fig:
-        img_bytes = pio.to_image(fig, format="png")
+        img_bytes = get_kaleido_pool().render(fig, fmt="png")
         return img_bytes
     return None
 
+def report_section(visualizer, pending=None):
+    """Sidebar action that renders every view and table into a downloadable report.
+
+    While a preview is shown the report waits for ``pending``, so it only
+    ever holds exact counts.
+    """
+    st.sidebar.title('Report')
+    formats = st.sidebar.multiselect('Image formats', ['png', 'svg'], default=['png'])
+    include_pdf = st.sidebar.checkbox('Combined PDF', value=True)
+    if st.sidebar.button('Render full report'):
+        if pending is not None:
+            try:
+                with st.sidebar, st.spinner('Waiting for the exact results...'):
+                    visualizer = pending.result()
+            except Exception as e:
+                st.sidebar.error(f'Could not compute the exact results for the report: {e}')
+                return
+        progress = st.sidebar.progress(0.0, text='Rendering report...')
+        archive = build_report(
+            visualizer, formats=formats, include_pdf=include_pdf,
+            on_progress=lambda done, total: progress.progress(done / total, text=f'Rendered {done}/{total} figures'),
+        )
+        st.sidebar.download_button('Download report (.zip)', data=archive, file_name='report.zip', mime='application/zip')
+
+def apply_filters(df, fingerprint, aggregates):
+    """Draw the global sidebar filters and return ``(visualizer, pending)`` for the active selection.
+
+    In preview mode a large selection first gets a visualizer over a sample,
+    and ``pending`` is the future of its exact visualizer; otherwise ``None``.
+    """
+    st.sidebar.title('Filters')
+    if len(df) < aggregates.n_rows:
+        st.sidebar.caption('Filters are not available on a streamed dataset.')
+        return get_visualizer(fingerprint, df, aggregates), None
+
+    index = get_filter_index(fingerprint, df)
+    first, last = index.date_bounds
+    start = end = None
+    if not pd.isna(first):
+        date_range = st.sidebar.date_input('Fecha de alta', value=(first.date(), last.date()),
+                                           min_value=first.date(), max_value=last.date())
+        if len(date_range) == 2 and tuple(date_range) != (first.date(), last.date()):
+            start, end = date_range
+    selected = {col: st.sidebar.multiselect(col.capitalize(), index.categories(col)) for col in index.positions}
+
+    if start is None and not any(selected.values()):
+        supersede_exact_build(None)
+        return get_visualizer(fingerprint, df, aggregates), None
+
+    # Only positions are computed on every rerun; the rows are sliced when a visualizer is built
+    rows = index.rows(start, end, **selected)
+    if not selection_size(rows):
+        supersede_exact_build(None)
+        st.warning('No rows match the selected filters.')
+        return None, None
+    key = f'{fingerprint}:{filter_key(start, end, **selected)}'
+    date_range = (start, end) if start is not None else None
+    select = lambda: index.df.iloc[rows]
+    if PREVIEW_MODE and selection_size(rows) > PREVIEW_SAMPLE_ROWS:
+        build = get_exact_visualizer(key, select, date_range)
+        supersede_exact_build(build)
+        exact = build.future()
+        if exact.done() and exact.exception() is not None:
+            # Drop the failed future so the next rerun of this selection tries again
+            # (clear() takes no arguments on the pinned Streamlit, so every entry goes)
+            get_exact_visualizer.clear()
+            st.error(f'Could not compute the exact results, showing the preview: {exact.exception()}')
+            return get_preview_visualizer(key, select, date_range), None
+        if exact.done():
+            return exact.result(), None
+        return get_preview_visualizer(key, select, date_range), exact
+    supersede_exact_build(None)
+    return get_visualizer(key, select, None, date_range), None
+
+def replace_when_ready(pending):
+    """Keep the preview on screen until the exact visualizer is built, then rerun to show it."""
+    status = st.empty()
+    while not pending.done():
+        # Drawing on every poll lets a new interaction stop this run
+        status.caption('Computing the exact results...')
+        time.sleep(0.2)
+    st.rerun()
+
+def debug_panel():
+    """Sidebar table of every stage timed during this rerun."""
+    records = run_records()
+    with st.sidebar.expander('Performance', expanded=True):
+        if not records:
+            st.caption('Nothing was timed in this run.')
+            return
+        table = pd.DataFrame(records).drop(columns=['run', 'ts'])
+        if 'params' in table:
+            table['params'] = table['params'].map(lambda params: ', '.join(map(str, params)) if isinstance(params, tuple) else '')
+        first = ['stage', 'seconds', 'rows', 'cache', 'figure_kb', 'memory_delta_mb']
+        table = table[[col for col in first if col in table] + [col for col in table if col not in first]]
+        st.dataframe(table, hide_index=True)
+        if TIMING_LOG:
+            st.caption(f'Also logged to {TIMING_LOG}')
+
 def main():
     st.title('Data Visualization Dashboard')
+    start_warm_up()
 
     # Load data
-    df = load_data()
+    df, fingerprint, aggregates = load_data()
     
     if not df.empty:
-        # Create an instance of the DataVisualizer class
-        visualizer = DataVisualizer(df)
-
         # Sidebar for user input
         st.sidebar.title('Select Visualization')
-        options = [
-            'Tablas', 
-            'Distribución de aseguradoras', 
-            'Estado por aseguradora', 
-            'Aseguradora por franja horaria',
-            'Distribución de edades', 
-            'Distribución de grupos de edades',
-            'Primer contacto por aseguradora', 
-            'Distribución de recomendaciones por aseguradora',
-            'Recomendación Sunburst'
-        ]
+        options = ['Tablas'] + list(VIEW_OPTIONS)
         choice = st.sidebar.selectbox('Select an option', options)
 
+        # Create an instance of the DataVisualizer class for the filtered rows
+        visualizer, pending = apply_filters(df, fingerprint, aggregates)
+        if visualizer is None:
+            return
+        if pending is not None:
+            st.info(f'Preview: counts estimated from a stratified sample of {len(visualizer.df):,} rows, '
+                    'with 95% confidence intervals as error bars. Exact results replace it when ready.')
+
+        report_section(visualizer, pending)
+
+        figure_cache = get_figure_cache()
+        st.sidebar.caption(f'Figure cache: {figure_cache.hits} hits, {figure_cache.misses} misses, '
+                           f'{figure_cache.nbytes / 1024 ** 2:.1f} MB')
+
         placeholder = st.empty()
 
         with placeholder.container():
@@ -93,63 +400,39 @@ def main():
                 groupby_columns = st.multiselect('Select columns to group by', options=all_columns, default=['aseguradora','recomendacion'])
                 if st.button('Show Table'):
                     if groupby_columns:
-                        result_df = visualizer.tablas(groupby_columns)
-                        
-                        # Display the table
-                        st.dataframe(result_df)
-                        
-                        # Add download button
-                        # csv = to_csv(result_df, index=False, encoding = 'utf-8')
-                        csv = result_df.to_csv(index=False).encode('utf-8-sig')
-                        st.download_button(
-                            label="Download Table as CSV",
-                            data=csv,
-                            file_name=f'table_{groupby_columns}.csv',
-                            mime='text/csv'
-                        )
+                        # Kept in the session so paging and sorting reruns keep the table on screen
+                        st.session_state['tablas_columns'] = groupby_columns
                     else:
+                        st.session_state.pop('tablas_columns', None)
                         st.error('Please select at least one column to group by.')
-            
-            elif choice == 'Distribución de aseguradoras':
-                fig = visualizer.distribución_de_aseguradoras()
-                if fig:
-                    st.plotly_chart(fig)
-
-            elif choice == 'Estado por aseguradora':
-                fig = visualizer.estado_por_aseguradora()
-                if fig:
-                    st.plotly_chart(fig)
-            
-            elif choice == 'Aseguradora por franja horaria':
-                fig = visualizer.aseguradora_por_franja_horaria()
-                if fig:
-                    st.plotly_chart(fig)
-            
-            elif choice == 'Distribución de edades':
-                fig = visualizer.distribución_de_edades()
-                if fig:
-                    st.plotly_chart(fig)
-            
-            elif choice == 'Distribución de grupos de edades':
-                fig = visualizer.distribución_groupo_de_edades()
-                if fig:
-                    st.plotly_chart(fig)
-            
-            elif choice == 'Primer contacto por aseguradora':
-                fig = visualizer.primer_contacto_por_aseguradora()
-                if fig:
-                    st.plotly_chart(fig)
-            
-            elif choice == 'Distribución de recomendaciones por aseguradora':
-                fig = visualizer.distribucion_de_recomendaciones_por_aseguradora()
-                if fig:
-                    st.plotly_chart(fig)
+                if st.session_state.get('tablas_columns'):
+                    tablas_section(visualizer, st.session_state['tablas_columns'])
             
             elif choice == 'Recomendación Sunburst':
-                fig = visualizer.recomendacion_sunburst()
-                if fig:
-                    st.plotly_chart(fig)
+                sunburst_section(visualizer)
+
+            elif choice == 'Tendencias':
+                tendencias_section(visualizer)
+
+            else:
+                figures, _ = visualizer.build_view(VIEW_OPTIONS[choice])
+                render_figures(figures)
+
+        if pending is not None:
+            replace_when_ready(pending)
 
 # Run the app
 if __name__ == '__main__':
-    main()
+    start_run()
+    cold = first_run()
+    try:
+        main()
+    finally:
+        # Also when main() ends in st.rerun() (a preview replaced by exact results) or a stop
+        elapsed = time.perf_counter() - RUN_START
+        emit({'stage': 'script_run', 'seconds': round(elapsed, 6), 'cold': cold,
+              'budget_seconds': COLD_START_BUDGET_S if cold else None})
+        if cold and elapsed > COLD_START_BUDGET_S:
+            logger.warning('Cold start took %.2f s, over the %.2f s budget', elapsed, COLD_START_BUDGET_S)
+        if DEBUG_PANEL:
+            debug_panel()
@@ -0,0 +1,97 @@
+import pandas as pd
+import pyarrow as pa
+
+from config import AGGREGATION_BACKEND
+
+
+def _like_pandas(counts, df, columns, dropna):
+    """Turn a ``(*columns, count)`` frame from another engine into the pandas groupby result.
+
+    Keys get the dtypes of ``df``, rows the order pandas sorts groups in
+    (category order, nulls last) and the counts become an int64 Series.
+    """
+    for col in columns:
+        counts[col] = counts[col].astype(df[col].dtype)
+    if dropna:
+        counts = counts.dropna(subset=columns)
+    counts = counts.sort_values(columns, na_position='last', kind='stable')
+    return counts.set_index(columns)['count'].astype('int64')
+
+
+class PandasBackend:
+    """``DataFrame.groupby().size()``; single-threaded, always available."""
+
+    name = 'pandas'
+
+    def group_counts(self, df, columns, dropna=False):
+        """Rows per observed combination of ``columns``, as a Series named ``count``."""
+        return df.groupby(list(columns), observed=True, dropna=dropna).size().rename('count')
+
+
+class ArrowBackend:
+    """Arrow compute hash aggregation, spread over Arrow's CPU thread pool."""
+
+    name = 'arrow'
+
+    def group_counts(self, df, columns, dropna=False):
+        columns = list(columns)
+        table = pa.Table.from_pandas(df[columns], preserve_index=False)
+        counts = table.group_by(columns, use_threads=True).aggregate([([], 'count_all')])
+        counts = counts.to_pandas().rename(columns={'count_all': 'count'})
+        return _like_pandas(counts, df, columns, dropna)
+
+
+class PolarsBackend:
+    """Polars' multithreaded group-by; needs the optional ``polars`` package."""
+
+    name = 'polars'
+
+    def group_counts(self, df, columns, dropna=False):
+        try:
+            import polars as pl
+        except ImportError as e:
+            raise ImportError("The 'polars' aggregation backend needs the polars package") from e
+
+        columns = list(columns)
+        frame = pl.from_arrow(pa.Table.from_pandas(df[columns], preserve_index=False))
+        counts = frame.group_by(columns).agg(pl.len().alias('count')).to_pandas()
+        return _like_pandas(counts, df, columns, dropna)
+
+
+BACKENDS = {backend.name: backend for backend in (PandasBackend(), ArrowBackend(), PolarsBackend())}
+
+
+def get_backend(name=None):
+    """The backend registered as ``name``, the configured one by default; instances pass through."""
+    if name is None:
+        name = AGGREGATION_BACKEND
+    if not isinstance(name, str):
+        return name
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown aggregation backend {name!r}; choose one of: {', '.join(BACKENDS)}") from None
+
+
+def verify_backends(df, column_sets, names=None):
+    """Check every backend against pandas on ``df``.
+
+    Returns ``{(name, columns): message}`` for each mismatch; backends whose
+    package is missing are skipped.
+    """
+    reference = BACKENDS['pandas']
+    mismatches = {}
+    for name in names or BACKENDS:
+        if name == 'pandas':
+            continue
+        for columns in column_sets:
+            for dropna in (False, True):
+                try:
+                    result = BACKENDS[name].group_counts(df, columns, dropna)
+                except ImportError:
+                    break
+                try:
+                    pd.testing.assert_series_equal(result, reference.group_counts(df, columns, dropna))
+                except AssertionError as e:
+                    mismatches[(name, tuple(columns))] = str(e)
+    return mismatches
@@ -0,0 +1,249 @@
+"""Benchmark the dashboard pipeline on synthetic datasets.
+
+Every stage (read, aggregation, caching, filter index, visualizer and each view)
+is timed, its peak traced memory recorded and, for views, the size of the
+figure JSON sent to the browser. The imports of a cold start are timed in a
+fresh interpreter. Runs can be stored as a baseline and later runs compared
+against it:
+
+    python benchmark.py --rows 10000 100000 --save-baseline baseline.json
+    python benchmark.py --rows 10000 100000 --baseline baseline.json
+    python benchmark.py --rows 1000000 --backend arrow
+    python benchmark.py --rows 1000000 --verify-backends
+
+Times come from untraced passes. Peak memory comes from a separate pass under
+tracemalloc, so it covers Python and NumPy allocations but not Arrow's own
+memory pool.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from aggregates import CUBE_DIMENSIONS, NUMERIC_COUNTS, DatasetAggregates
+from backends import BACKENDS, get_backend, verify_backends
+from cache import DatasetCache
+from features import ensure_columns
+from filters import FilterIndex
+from ingestion import read_dataset
+from report import REPORT_GROUPINGS
+from synthetic import write_dataset
+from visualizacion_1 import DataVisualizer
+
+# Stages slower or larger than the baseline by more than the tolerance, and by
+# more than these absolute amounts, are reported as regressions
+MIN_SECONDS_DELTA = 0.05
+MIN_PEAK_MB_DELTA = 1.0
+
+
+def measure(fn, trace=False):
+    """Run ``fn`` and return ``(result, {'seconds': ...})``, or ``(result, {'peak_mb': ...})`` with ``trace``.
+
+    Tracing slows allocations down several times, so a stage is timed and
+    traced in separate runs.
+    """
+    if not trace:
+        start = time.perf_counter()
+        result = fn()
+        return result, {'seconds': time.perf_counter() - start}
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    return result, {'peak_mb': max(peak, 0) / 1024 ** 2}
+
+
+def figure_kb(figures):
+    return sum(len(fig.to_json()) for fig in figures) / 1024
+
+
+def dataset_path(data_dir, n_rows, fmt):
+    """Synthetic dataset of ``n_rows``, generated on first use."""
+    path = os.path.join(data_dir, f'synthetic-{n_rows}.{fmt}')
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        write_dataset(path, n_rows)
+    return path
+
+
+# Modules app.py imports before drawing anything, and the plotting stack it defers
+STARTUP_IMPORTS = {
+    'import:app_shell': 'import streamlit, pandas, cache, dataset, filters, report, sampling, tables, instrumentation',
+    'import:visualizer': 'import visualizacion_1',
+}
+
+
+def measure_startup():
+    """Wall time of each import set in a fresh interpreter, as ``{stage: stats}``."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    stages = {}
+    for name, statement in STARTUP_IMPORTS.items():
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], cwd=here, check=True)
+        stages[name] = {'seconds': time.perf_counter() - start, 'peak_mb': 0.0}
+    return stages
+
+
+def run_pipeline(path, backend=None, trace=False):
+    """One pass over every stage of ``path``; returns ``{stage: stats}``.
+
+    Stages are timed, or with ``trace`` (and tracemalloc running) measured for peak memory.
+    """
+    stages = {}
+
+    def stage(name, fn, **extra):
+        result, stats = measure(fn, trace)
+        stages[name] = {**stats, **extra}
+        return result
+
+    df = stage('read', lambda: read_dataset(path))
+    aggregates = stage('aggregates', lambda: DatasetAggregates.from_frame(df, backend))
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = DatasetCache(cache_dir)
+        # The Parquet file is written in the background; the stage includes waiting for it
+        stage('cache_write', lambda: (cache.put('bench', df, path, meta={'aggregates': aggregates}), cache.flush()))
+        stage('cache_read', lambda: DatasetCache(cache_dir).get_entry('bench', path))
+    stage('filter_index', lambda: FilterIndex(df))
+    visualizer = stage('visualizer', lambda: DataVisualizer(df, aggregates=aggregates, backend=get_backend(backend)))
+
+    for view in DataVisualizer.VIEWS:
+        figures, _ = stage(f'view:{view}', lambda: visualizer.build_view(view))
+        stages[f'view:{view}']['figure_kb'] = figure_kb(figures)
+    for columns in REPORT_GROUPINGS:
+        name = f"view:tablas:{'+'.join(columns)}"
+        figures, table = stage(name, lambda: visualizer.tablas(list(columns)))
+        stages[name].update(figure_kb=figure_kb(figures), groups=len(table))
+    return stages
+
+
+def verify(rows, data_dir, fmt='csv'):
+    """Mismatches between the aggregation backends on each dataset size, as ``{size: mismatches}``."""
+    column_sets = [CUBE_DIMENSIONS, *([*by, column] for column, by in NUMERIC_COUNTS.items()),
+                   *map(list, REPORT_GROUPINGS)]
+    failures = {}
+    for n_rows in rows:
+        df = read_dataset(dataset_path(data_dir, n_rows, fmt))
+        ensure_columns(df, ['age_group'])
+        mismatches = verify_backends(df, column_sets)
+        if mismatches:
+            failures[str(n_rows)] = mismatches
+    return failures
+
+
+def run(rows, data_dir, fmt='csv', repeat=1, backend=None):
+    """Benchmark every size in ``rows``: each stage's best time over ``repeat`` passes, then its peak memory in one traced pass."""
+    results = {
+        'meta': {
+            'created': pd.Timestamp.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'format': fmt,
+            'repeat': repeat,
+            'backend': get_backend(backend).name,
+        },
+        'sizes': {},
+    }
+    results['sizes']['startup'] = measure_startup()
+    for n_rows in rows:
+        path = dataset_path(data_dir, n_rows, fmt)
+        best = {}
+        for _ in range(repeat):
+            for name, stats in run_pipeline(path, backend).items():
+                if name not in best or stats['seconds'] < best[name]['seconds']:
+                    best[name] = stats
+        tracemalloc.start()
+        try:
+            for name, stats in run_pipeline(path, backend, trace=True).items():
+                best[name]['peak_mb'] = stats['peak_mb']
+        finally:
+            tracemalloc.stop()
+        results['sizes'][str(n_rows)] = best
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Stage metrics that grew beyond ``tolerance`` relative to ``baseline``.
+
+    Returns a list of ``(size, stage, metric, before, after)``.
+    """
+    floors = {'seconds': MIN_SECONDS_DELTA, 'peak_mb': MIN_PEAK_MB_DELTA, 'figure_kb': 0}
+    regressions = []
+    for size, stages in results['sizes'].items():
+        for name, stats in stages.items():
+            before = baseline['sizes'].get(size, {}).get(name)
+            if before is None:
+                continue
+            for metric, floor in floors.items():
+                if metric not in stats or metric not in before:
+                    continue
+                if stats[metric] > before[metric] * (1 + tolerance) and stats[metric] - before[metric] > floor:
+                    regressions.append((size, name, metric, before[metric], stats[metric]))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    for size, stages in results['sizes'].items():
+        print(f'\n{int(size):,} rows' if size.isdigit() else f'\n{size}')
+        print(f"{'stage':<62} {'seconds':>9} {'peak MB':>9} {'fig KB':>9}")
+        for name, stats in stages.items():
+            line = f"{name:<62} {stats['seconds']:9.3f} {stats['peak_mb']:9.1f} {stats.get('figure_kb', 0):9.1f}"
+            before = (baseline or {}).get('sizes', {}).get(size, {}).get(name)
+            if before and before['seconds']:
+                line += f"   x{stats['seconds'] / before['seconds']:.2f} time"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard pipeline on synthetic data.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='synthetic file format')
+    parser.add_argument('--data-dir', default='.benchmark', help='where generated datasets are kept')
+    parser.add_argument('--backend', choices=list(BACKENDS), help='aggregation backend (default: configured)')
+    parser.add_argument('--verify-backends', action='store_true',
+                        help='only check that every aggregation backend matches pandas')
+    parser.add_argument('--repeat', type=int, default=1, help='passes per size; the best time is kept')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--save-baseline', metavar='PATH', help='store the results as a baseline')
+    parser.add_argument('--baseline', metavar='PATH', help='compare against a stored baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative growth before failing')
+    args = parser.parse_args(argv)
+
+    if args.verify_backends:
+        failures = verify(args.rows, args.data_dir, args.format)
+        for size, mismatches in failures.items():
+            for (name, columns), message in mismatches.items():
+                print(f"MISMATCH {int(size):,} rows {name} {'+'.join(columns)}:\n{message}")
+        print('Backends differ' if failures else f"All backends match pandas on {', '.join(map(str, args.rows))} rows")
+        return 1 if failures else 0
+
+    results = run(args.rows, args.data_dir, args.format, args.repeat, args.backend)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nWrote {path}')
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for size, name, metric, before, after in regressions:
+            print(f'REGRESSION {size} {name} {metric}: {before:.3f} -> {after:.3f}')
+        if regressions:
+            return 1
+        print(f'\nNo regressions beyond {args.tolerance:.0%} of the baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
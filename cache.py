@@ -0,0 +1,238 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from config import CACHE_DIR, DATASET_CACHE_BUDGET_MB, FIGURE_CACHE_BUDGET_MB
+
+
+def fingerprint_path(path):
+    """Fingerprint a local file by its absolute path, mtime and size."""
+    stat = os.stat(path)
+    raw = f'{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def fingerprint_bytes(data):
+    """Fingerprint uploaded content by its SHA-256 hash."""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def source_id(name):
+    """Stable short id for a data source (path or uploaded file name)."""
+    return hashlib.sha256(str(name).encode('utf-8')).hexdigest()[:12]
+
+
+def frame_nbytes(df):
+    """Approximate in-memory size of a DataFrame in bytes."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def result_nbytes(value):
+    """Approximate size of a cached view result: serialized figures plus any frames."""
+    if isinstance(value, (list, tuple)):
+        return sum(result_nbytes(item) for item in value)
+    if isinstance(value, pd.DataFrame):
+        return frame_nbytes(value)
+    if hasattr(value, 'to_json'):
+        return len(value.to_json())
+    return 0
+
+
+class DatasetCache:
+    """Two-tier cache of prepared DataFrames.
+
+    The memory tier is an LRU bounded by ``memory_budget`` bytes; the disk tier
+    stores each frame as Parquet under ``cache_dir``, with its metadata (the
+    aggregates and the ingest position) pickled alongside, and is written on a
+    background thread. Entries are keyed
+    by the source fingerprint, and storing a new fingerprint for a source drops
+    the stale entries of that source from both tiers.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, memory_budget=DATASET_CACHE_BUDGET_MB * 1024 ** 2):
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()  # key -> (source, frame, nbytes, meta)
+        self._lock = threading.Lock()
+        # One thread, so writes and removals of the disk tier happen in the order they were asked for
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cache-write')
+
+    def _disk_path(self, source, key):
+        return os.path.join(self.cache_dir, f'{source_id(source)}-{key}.parquet')
+
+    @staticmethod
+    def _meta_path(path):
+        return path[:-len('.parquet')] + '.meta.pkl'
+
+    def _find_on_disk(self, key):
+        if not os.path.isdir(self.cache_dir):
+            return None
+        suffix = f'-{key}.parquet'
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(suffix):
+                return os.path.join(self.cache_dir, name)
+        return None
+
+    def get(self, key, source=None):
+        """Return the cached frame for ``key`` or ``None``."""
+        entry = self.get_entry(key, source)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key, source=None, disk=True):
+        """Return ``(frame, meta)`` for ``key`` or ``None``; ``disk=False`` only looks in memory."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                _, df, _, meta = self._entries[key]
+                return df, meta
+        if not disk:
+            return None
+
+        path = self._disk_path(source, key) if source is not None else self._find_on_disk(key)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+            meta = {}
+            if os.path.exists(self._meta_path(path)):
+                with open(self._meta_path(path), 'rb') as f:
+                    meta = pickle.load(f)
+        except Exception:
+            # A truncated or unreadable file is treated as a miss
+            return None
+        self._remember(key, source, df, meta)
+        return df, meta
+
+    def latest(self, source):
+        """Return ``(key, frame, meta)`` of the newest cached version of ``source``, or ``None``."""
+        with self._lock:
+            for key in reversed(self._entries):
+                if self._entries[key][0] == source:
+                    _, df, _, meta = self._entries[key]
+                    return key, df, meta
+
+        if not os.path.isdir(self.cache_dir):
+            return None
+        prefix = f'{source_id(source)}-'
+        names = [name for name in os.listdir(self.cache_dir) if name.startswith(prefix) and name.endswith('.parquet')]
+        if not names:
+            return None
+        newest = max(names, key=lambda name: os.path.getmtime(os.path.join(self.cache_dir, name)))
+        key = newest[len(prefix):-len('.parquet')]
+        entry = self.get_entry(key, source)
+        return (key, *entry) if entry is not None else None
+
+    def put(self, key, df, source=None, meta=None):
+        """Store ``df`` under ``key`` in both tiers, replacing older versions of ``source``.
+
+        The memory tier is updated at once; the disk tier is written in the
+        background (see ``flush``), so a load does not wait for the Parquet file.
+        """
+        meta = meta or {}
+        if source is not None:
+            self.invalidate(source, keep=key)
+        self._remember(key, source, df, meta)
+
+        if source is not None:
+            self._writer.submit(self._write, key, df, source, meta)
+
+    def flush(self):
+        """Wait until every disk write queued so far is done."""
+        self._writer.submit(lambda: None).result()
+
+    def _write(self, key, df, source, meta):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._disk_path(source, key)
+        tmp_path = f'{path}.tmp'
+        try:
+            with open(self._meta_path(path), 'wb') as f:
+                pickle.dump(meta, f)
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except Exception:
+            # The disk tier is best effort; the memory tier still holds the frame
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def invalidate(self, source, keep=None):
+        """Drop every entry of ``source`` except ``keep`` from both tiers.
+
+        The files are removed on the writer thread, after any write queued before.
+        """
+        with self._lock:
+            for key in [k for k, (src, _, _, _) in self._entries.items() if src == source and k != keep]:
+                del self._entries[key]
+        self._writer.submit(self._remove_files, source, keep)
+
+    def _remove_files(self, source, keep):
+        if not os.path.isdir(self.cache_dir):
+            return
+        prefix = f'{source_id(source)}-'
+        keep_names = {f'{prefix}{keep}.parquet', f'{prefix}{keep}.meta.pkl'}
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix) and name not in keep_names:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def _remember(self, key, source, df, meta=None):
+        with self._lock:
+            self._entries[key] = (source, df, frame_nbytes(df), meta or {})
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        total = sum(entry[2] for entry in self._entries.values())
+        # Always keep the most recently used entry, even if it exceeds the budget
+        while total > self.memory_budget and len(self._entries) > 1:
+            _, (_, _, nbytes, _) = self._entries.popitem(last=False)
+            total -= nbytes
+
+
+class FigureCache:
+    """In-process LRU of built view results, bounded by their serialized size.
+
+    Keys are ``(view, params, fingerprint)`` tuples; ``hits`` and ``misses``
+    count lookups since the cache was created.
+    """
+
+    def __init__(self, budget=FIGURE_CACHE_BUDGET_MB * 1024 ** 2):
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return sum(nbytes for _, nbytes in self._entries.values())
+
+    def get(self, key):
+        """Return the cached value for ``key`` or ``None``, updating the counters."""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, nbytes=None):
+        """Store ``value``; ``nbytes`` skips re-serializing a value whose size is already known."""
+        nbytes = result_nbytes(value) if nbytes is None else nbytes
+        with self._lock:
+            self._entries[key] = (value, nbytes)
+            self._entries.move_to_end(key)
+            total = self.nbytes
+            while total > self.budget and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                total -= evicted
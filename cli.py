@@ -0,0 +1,104 @@
+"""Headless entry point for nightly jobs.
+
+Loads a dataset through the same cache the Streamlit app uses (so the app
+starts warm), and optionally renders views or the full report to files:
+
+    python cli.py fake_data_grande.csv
+    python cli.py fake_data_grande.csv --views estado_por_aseguradora --formats png html -o out/
+    python cli.py fake_data_grande.csv --report -o out/
+"""
+import argparse
+import os
+import sys
+import time
+
+from cache import DatasetCache
+from config import CACHE_DIR
+from dataset import load_dataset
+from report import REPORT_GROUPINGS, build_report, get_kaleido_pool, slugify
+from visualizacion_1 import DataVisualizer
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Precompute the dashboard cache and render views to files.')
+    parser.add_argument('data', help='CSV, Parquet or Arrow file to load')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='dataset cache directory read by the app')
+    parser.add_argument('--views', nargs='*', default=[], choices=DataVisualizer.VIEWS + ['tablas'],
+                        metavar='VIEW', help='views to render (tablas uses the report groupings)')
+    parser.add_argument('--all-views', action='store_true', help='render every view')
+    parser.add_argument('--formats', nargs='+', default=['png'], choices=['png', 'svg', 'html'],
+                        help='output formats for rendered views')
+    parser.add_argument('--report', action='store_true', help='write the full report zip')
+    parser.add_argument('-o', '--output', default='.', help='output directory')
+    return parser.parse_args(argv)
+
+
+def render_views(visualizer, views, formats, output):
+    """Write every figure of ``views`` in ``formats`` under ``output``; return the paths."""
+    figures = {}
+    paths = []
+    for view in views:
+        if view == 'tablas':
+            for columns in REPORT_GROUPINGS:
+                view_figures, table = visualizer.build_view('tablas', tuple(columns))
+                name = f"tablas_{'_'.join(columns)}"
+                path = os.path.join(output, f'{name}.csv')
+                table.to_csv(path, index=False, encoding='utf-8-sig')
+                paths.append(path)
+                figures.update({f'{name}_{i}': fig for i, fig in enumerate(view_figures, start=1)})
+        else:
+            view_figures, _ = visualizer.build_view(view)
+            figures.update({f'{slugify(view)}_{i}': fig for i, fig in enumerate(view_figures, start=1)})
+
+    for name, fig in figures.items():
+        if 'html' in formats:
+            path = os.path.join(output, f'{name}.html')
+            fig.write_html(path, include_plotlyjs='cdn')
+            paths.append(path)
+
+    image_formats = [fmt for fmt in formats if fmt != 'html']
+    if image_formats:
+        jobs = {(name, fmt): (fig, fmt) for name, fig in figures.items() for fmt in image_formats}
+        for (name, fmt), data in get_kaleido_pool().render_many(jobs).items():
+            path = os.path.join(output, f'{name}.{fmt}')
+            with open(path, 'wb') as f:
+                f.write(data)
+            paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.data):
+        print(f'File not found: {args.data}', file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    cache = DatasetCache(cache_dir=args.cache_dir)
+    df, fingerprint, meta = load_dataset(args.data, cache)
+    cache.flush()
+    aggregates = meta['aggregates']
+    print(f'Loaded {aggregates.n_rows:,} rows ({fingerprint}) in {time.perf_counter() - start:.1f} s; '
+          f'cache written to {args.cache_dir}')
+
+    views = DataVisualizer.VIEWS + ['tablas'] if args.all_views else args.views
+    if not views and not args.report:
+        return 0
+
+    visualizer = DataVisualizer(df, fingerprint=fingerprint, aggregates=aggregates,
+                                sampled=len(df) < aggregates.n_rows)
+    os.makedirs(args.output, exist_ok=True)
+    if views:
+        paths = render_views(visualizer, views, args.formats, args.output)
+        print(f'Wrote {len(paths)} files to {args.output}')
+    if args.report:
+        path = os.path.join(args.output, 'report.zip')
+        formats = [fmt for fmt in args.formats if fmt != 'html'] or ['png']
+        with open(path, 'wb') as f:
+            f.write(build_report(visualizer, formats=formats))
+        print(f'Wrote {path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
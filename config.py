@@ -0,0 +1,69 @@
+import os
+
+import pandas as pd
+
+# Loaded frames are shared (between app sessions, and with the cache); with Copy-on-Write
+# (always on from pandas 3) an accidental write gives the writer a private copy instead of
+# corrupting them. Set here because every entry point (app, cli, benchmark) imports this module
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Directory where prepared datasets are persisted between runs
+CACHE_DIR = os.environ.get('DASHBOARD_CACHE_DIR', '.dashboard_cache')
+
+# Maximum memory (in MB) the in-process dataset cache may hold before evicting
+DATASET_CACHE_BUDGET_MB = int(os.environ.get('DASHBOARD_DATASET_CACHE_MB', '1024'))
+
+# Format of the date columns in raw exports; 'ISO8601' parses any ISO timestamp without inference
+DATE_FORMAT = os.environ.get('DASHBOARD_DATE_FORMAT', 'ISO8601')
+
+# Numeric distributions are binned on the server: number of bins and 'fixed' or 'adaptive' edges
+NUMERIC_BINS = int(os.environ.get('DASHBOARD_NUMERIC_BINS', '50'))
+NUMERIC_BINNING = os.environ.get('DASHBOARD_NUMERIC_BINNING', 'fixed')
+
+# Maximum number of individual points sent to the browser in a single figure
+MAX_POINTS_PER_FIGURE = int(os.environ.get('DASHBOARD_MAX_POINTS', '20000'))
+
+# Maximum serialized size (in MB) of the figures kept by the figure cache
+FIGURE_CACHE_BUDGET_MB = int(os.environ.get('DASHBOARD_FIGURE_CACHE_MB', '256'))
+
+# 'full' loads the whole frame, 'streaming' folds CSV chunks into aggregates,
+# 'auto' streams when the estimated in-memory size would exceed the ceiling
+INGESTION_MODE = os.environ.get('DASHBOARD_INGESTION_MODE', 'auto')
+STREAMING_MEMORY_MB = int(os.environ.get('DASHBOARD_STREAMING_MEMORY_MB', '2048'))
+
+# Rows kept as a uniform sample for row-level views in streaming mode
+STREAMING_SAMPLE_ROWS = int(os.environ.get('DASHBOARD_STREAMING_SAMPLE_ROWS', '100000'))
+
+# Kaleido processes kept alive to render report figures concurrently
+REPORT_WORKERS = int(os.environ.get('DASHBOARD_REPORT_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Threads used to build the figures of one view concurrently
+FIGURE_WORKERS = int(os.environ.get('DASHBOARD_FIGURE_WORKERS', '4'))
+
+# Rows per page of the Tablas view
+TABLE_PAGE_SIZE = int(os.environ.get('DASHBOARD_TABLE_PAGE_SIZE', '100'))
+
+# Largest values of each column drawn in the Tablas chart; the rest are summed into "Otros"
+TABLE_TOP_N = int(os.environ.get('DASHBOARD_TABLE_TOP_N', '20'))
+
+# Show the performance panel in the sidebar (1/true to enable)
+DEBUG_PANEL = os.environ.get('DASHBOARD_DEBUG', '').lower() in ('1', 'true', 'yes')
+
+# JSON-lines file every timed stage is appended to; empty disables the log
+TIMING_LOG = os.environ.get('DASHBOARD_TIMING_LOG', '')
+
+# Target duration (in seconds) of the first script run of a fresh process; slower runs are logged
+COLD_START_BUDGET_S = float(os.environ.get('DASHBOARD_COLD_START_BUDGET_S', '5'))
+
+# Engine for grouped row counts: 'pandas' (default), 'arrow' (multithreaded) or 'polars' (if installed)
+AGGREGATION_BACKEND = os.environ.get('DASHBOARD_AGGREGATION_BACKEND', 'pandas')
+
+# Levels of the recomendacion sunburst drawn at once; deeper levels load when drilling into a node
+SUNBURST_MAX_DEPTH = int(os.environ.get('DASHBOARD_SUNBURST_MAX_DEPTH', '2'))
+
+# Show filtered views from a stratified sample first, replaced by the exact results once computed (1/true to enable)
+PREVIEW_MODE = os.environ.get('DASHBOARD_PREVIEW', '').lower() in ('1', 'true', 'yes')
+
+# Rows in the preview sample; smaller selections are always computed exactly
+PREVIEW_SAMPLE_ROWS = int(os.environ.get('DASHBOARD_PREVIEW_SAMPLE_ROWS', '50000'))
@@ -0,0 +1,157 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from aggregates import DatasetAggregates
+from cache import fingerprint_bytes, fingerprint_path
+from filters import sort_by_date
+from instrumentation import timed
+from ingestion import append_rows, read_dataset, read_new_rows, read_snapshot, should_stream, stream_csv
+
+
+class LoadProgress:
+    """Completed fraction and current stage of a dataset load, polled by the UI."""
+
+    def __init__(self):
+        self.fraction = 0.0
+        self.text = 'Waiting to load...'
+
+    def update(self, fraction, text):
+        self.fraction, self.text = fraction, text
+
+
+def prepare_data(source):
+    """Read the dataset with its declared schema, as ``(frame, ingest position)``.
+
+    Derived columns are built lazily by the views (see features.py). Rows are
+    stored in fecha_alta order so the filter index can use the frame as is.
+    Local files come with the position their next refresh resumes from;
+    uploads have none.
+    """
+    if isinstance(source, str):
+        df, position = read_snapshot(source)
+    else:
+        df, position = read_dataset(source), {}
+    return sort_by_date(df), position
+
+
+def _has_aggregates(meta):
+    """Whether cached ``meta`` holds aggregates with every rollup this release expects."""
+    return 'aggregates' in meta and meta['aggregates'].current
+
+
+def refresh_data(cache, uploaded_file, source, progress=None):
+    """Build ``(frame, meta)`` for a new version of ``source``.
+
+    When an older version of a local file is cached, only the rows appended
+    since it was ingested are parsed, derived and merged into the cached frame and
+    aggregates; otherwise the file is read in full. Local CSVs too large for
+    memory are streamed into aggregates plus a row sample.
+    """
+    progress = progress or LoadProgress()
+    if isinstance(uploaded_file, str) and should_stream(uploaded_file):
+        progress.update(0.1, 'Streaming the file into aggregates...')
+        with timed('stream_csv') as record:
+            aggregates, sample = stream_csv(uploaded_file)
+            record['rows'] = aggregates.n_rows
+        return sample, {'aggregates': aggregates, 'streamed': True}
+
+    previous = cache.latest(source) if isinstance(uploaded_file, str) else None
+    appended = None
+    if previous is not None and _has_aggregates(previous[2]) and not previous[2].get('streamed'):
+        with timed('read_new_rows') as record:
+            appended = read_new_rows(uploaded_file, previous[2])
+            record['rows'] = None if appended is None else len(appended[0])
+
+    if appended is None:
+        progress.update(0.1, 'Reading the file...')
+        df, position = prepare_data(uploaded_file)
+        progress.update(0.6, f'Aggregating {len(df):,} rows...')
+        with timed('aggregates', rows=len(df)):
+            aggregates = DatasetAggregates.from_frame(df)
+    else:
+        _, previous_df, previous_meta = previous
+        new_rows, position = appended
+        aggregates = previous_meta['aggregates']
+        if len(new_rows):
+            progress.update(0.6, f'Merging {len(new_rows):,} new rows...')
+            with timed('aggregates', rows=len(new_rows), incremental=True):
+                aggregates = aggregates.merge(DatasetAggregates.from_frame(new_rows))
+            df = sort_by_date(append_rows(previous_df, new_rows))
+        else:
+            df = previous_df
+
+    return df, {'aggregates': aggregates, **position}
+
+
+# One lock per dataset key, so concurrent sessions wait for a single load instead of each reading a copy
+_load_locks = {}
+_load_locks_guard = threading.Lock()
+
+
+def dataset_key(uploaded_file):
+    """``(fingerprint, source)`` of a local path or uploaded file."""
+    # Local files are keyed by path + mtime, uploads by their content hash
+    if isinstance(uploaded_file, str):
+        return fingerprint_path(uploaded_file), os.path.abspath(uploaded_file)
+    return fingerprint_bytes(uploaded_file.getvalue()), uploaded_file.name
+
+
+def load_dataset(uploaded_file, cache, progress=None, key=None):
+    """Return ``(frame, fingerprint, meta)`` for a local path or uploaded file, through ``cache``.
+
+    ``key`` is the file's ``dataset_key`` when the caller already has it.
+    Every caller gets the same cached frame; treat it as read-only.
+    """
+    progress = progress or LoadProgress()
+    key, source = key or dataset_key(uploaded_file)
+
+    with _load_locks_guard:
+        lock = _load_locks.setdefault(key, threading.Lock())
+    with lock, timed('load_dataset', cache='hit') as record:
+        progress.update(0.05, 'Checking the dataset cache...')
+        entry = cache.get_entry(key, source)
+        if entry is None or not _has_aggregates(entry[1]):
+            record['cache'] = 'miss'
+            entry = refresh_data(cache, uploaded_file, source, progress)
+            progress.update(0.85, 'Caching the dataset...')
+            with timed('cache_write', rows=len(entry[0])):
+                cache.put(key, entry[0], source, meta=entry[1])
+        df, meta = entry
+        record['rows'] = meta['aggregates'].n_rows
+    progress.update(1.0, 'Ready')
+    return df, key, meta
+
+
+# Loads run here so the page can draw (and report progress) while the data is read
+_loader = ThreadPoolExecutor(max_workers=2, thread_name_prefix='dataset')
+_pending = {}
+
+
+def load_dataset_async(uploaded_file, cache):
+    """Start ``load_dataset`` in the background and return ``(future, progress)``.
+
+    A dataset already in the memory tier is returned at once, as a completed
+    future. Sessions asking for a dataset that is still loading share its future.
+    """
+    key, source = dataset_key(uploaded_file)
+    with timed('memory_lookup') as record:
+        entry = cache.get_entry(key, source, disk=False)
+        record['cache'] = 'hit' if entry is not None and _has_aggregates(entry[1]) else 'miss'
+    if record['cache'] == 'hit':
+        future, progress = Future(), LoadProgress()
+        future.set_result((entry[0], key, entry[1]))
+        progress.update(1.0, 'Ready')
+        return future, progress
+
+    with _load_locks_guard:
+        pending = _pending.get(key)
+        if pending is None:
+            progress = LoadProgress()
+            # Run in a copy of the caller's context so the timings stay tagged with its rerun
+            future = _loader.submit(contextvars.copy_context().run, load_dataset, uploaded_file, cache, progress,
+                                    (key, source))
+            pending = _pending[key] = future, progress
+            pending[0].add_done_callback(lambda _: _pending.pop(key, None))
+    return pending
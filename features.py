@@ -0,0 +1,83 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+MONTH_NAMES = [
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December',
+]
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+AGE_BINS = [-np.inf, 18, 60, np.inf]
+AGE_LABELS = ['Menor de edad', 'Adulto hasta 59', '60+']
+
+# Suffix used in the derived column names for each date column
+DATE_SUFFIXES = {
+    'fecha_alta': 'alta',
+    'fecha_primer_contacto': 'contacto',
+    'fecha_ultimo_estado': 'ultimo_estado',
+}
+
+# name -> function building the column from the frame
+DERIVED_COLUMNS = {}
+
+_lock = threading.Lock()
+
+
+def derived(name):
+    """Register a vectorized builder for the derived column ``name``."""
+    def register(func):
+        DERIVED_COLUMNS[name] = func
+        return func
+    return register
+
+
+def _named_categorical(numbers, names, index):
+    """Map 1-based numbers (NaN for missing) to an ordered categorical of names."""
+    codes = numbers.fillna(0).to_numpy(dtype='int64') - 1
+    return pd.Series(pd.Categorical.from_codes(codes, categories=names, ordered=True), index=index)
+
+
+def _register_date_features(date_col, suffix):
+    @derived(f'mes_{suffix}')
+    def month(df):
+        return _named_categorical(df[date_col].dt.month, MONTH_NAMES, df.index)
+
+    @derived(f'dia_semana_{suffix}')
+    def weekday(df):
+        return _named_categorical(df[date_col].dt.dayofweek + 1, DAY_NAMES, df.index)
+
+    @derived(f'hora_{suffix}')
+    def hour(df):
+        return df[date_col].dt.hour.astype('UInt8')
+
+
+for _date_col, _suffix in DATE_SUFFIXES.items():
+    _register_date_features(_date_col, _suffix)
+
+
+@derived('age_group')
+def age_group(df):
+    return pd.cut(df['persona_edad'].astype('float64'), bins=AGE_BINS, labels=AGE_LABELS, right=False)
+
+
+def available_columns(df):
+    """Columns that are present in ``df`` or can be derived on demand."""
+    return list(df.columns) + [col for col in DERIVED_COLUMNS if col not in df.columns]
+
+
+def ensure_columns(df, columns):
+    """Compute the missing derived ``columns`` of ``df`` in place.
+
+    Each column is built the first time a view asks for it and then stays on
+    the frame, so later requests are free.
+    """
+    missing = [col for col in columns if col not in df.columns and col in DERIVED_COLUMNS]
+    if not missing:
+        return df
+    with _lock:
+        for col in missing:
+            if col not in df.columns:
+                df[col] = DERIVED_COLUMNS[col](df)
+    return df
@@ -0,0 +1,90 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# Categorical columns the global filters can restrict
+FILTER_COLUMNS = ['aseguradora', 'estado']
+
+
+def sort_by_date(df):
+    """``df`` ordered by fecha_alta with NaT last; returned as is when already in order."""
+    dates = df['fecha_alta']
+    n_dated = int(dates.notna().sum())
+    if dates.iloc[:n_dated].is_monotonic_increasing and dates.iloc[n_dated:].isna().all():
+        return df
+    return df.sort_values('fecha_alta', kind='stable', na_position='last', ignore_index=True)
+
+
+class FilterIndex:
+    """Precomputed indexes for slicing a dataset by fecha_alta range and category.
+
+    The frame is kept sorted by ``fecha_alta`` (NaT last), so a date range is a
+    binary-search slice. Each filter column keeps the sorted row positions of
+    every category, so a category filter only touches the rows it selects.
+    """
+
+    def __init__(self, df):
+        self.df = df = sort_by_date(df)
+        self.n_dated = int(df['fecha_alta'].notna().sum())
+        self.dates = df['fecha_alta'].to_numpy()[:self.n_dated]
+        self.positions = {
+            col: {value: np.asarray(rows) for value, rows in df.groupby(col, observed=True).indices.items()}
+            for col in FILTER_COLUMNS if col in df.columns
+        }
+
+    @property
+    def date_bounds(self):
+        """First and last fecha_alta in the dataset."""
+        if not self.n_dated:
+            return pd.NaT, pd.NaT
+        return pd.Timestamp(self.dates[0]), pd.Timestamp(self.dates[-1])
+
+    def categories(self, col):
+        return list(self.positions.get(col, {}))
+
+    def date_slice(self, start, end):
+        """Row range ``[lo, hi)`` whose fecha_alta falls between the ``start`` and ``end`` days."""
+        lo = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start).normalize()), side='left')
+        hi = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end).normalize() + pd.Timedelta(days=1)), side='left')
+        return int(lo), int(hi)
+
+    def rows(self, start=None, end=None, **categories):
+        """Positions of the rows within the date range whose filter columns take one of the given values.
+
+        Without a date range every row (including NaT dates) is eligible; an
+        empty or missing category list leaves that column unfiltered. Returns a
+        ``slice`` or a sorted position array; no row is copied.
+        """
+        lo, hi = (0, len(self.df)) if start is None or end is None else self.date_slice(start, end)
+
+        positions = None
+        for col, values in categories.items():
+            if not values:
+                continue
+            arrays = []
+            for value in values:
+                rows = self.positions[col].get(value)
+                if rows is not None:
+                    arrays.append(rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)])
+            selected = np.sort(np.concatenate(arrays)) if arrays else np.empty(0, dtype=np.intp)
+            positions = selected if positions is None else np.intersect1d(positions, selected, assume_unique=True)
+
+        if positions is None:
+            return slice(lo, hi)
+        return positions
+
+    def select(self, start=None, end=None, **categories):
+        """The rows ``rows`` selects, as a frame."""
+        return self.df.iloc[self.rows(start, end, **categories)]
+
+
+def selection_size(rows):
+    """Number of rows in a ``FilterIndex.rows`` selection."""
+    return rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+
+
+def filter_key(start=None, end=None, **categories):
+    """Short stable key describing an active filter combination."""
+    raw = repr((str(start), str(end), sorted((col, sorted(map(str, values))) for col, values in categories.items())))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
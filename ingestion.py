@@ -0,0 +1,383 @@
+import hashlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from aggregates import DatasetAggregates
+from features import DERIVED_COLUMNS
+from config import DATE_FORMAT, INGESTION_MODE, STREAMING_MEMORY_MB, STREAMING_SAMPLE_ROWS
+from instrumentation import timed
+
+DATE_COLUMNS = ['fecha_alta', 'fecha_primer_contacto', 'fecha_ultimo_estado']
+
+CATEGORICAL_COLUMNS = [
+    'aseguradora', 'estado', 'franja_horaria', 'recomendacion',
+    'persona_genero', 'estado_primer_movimiento',
+]
+
+# Declared dtype of every known raw column. Integer columns are read as float32
+# first (they may contain nulls or a trailing '.0') and then narrowed.
+SCHEMA = {
+    **{col: 'datetime64[ns]' for col in DATE_COLUMNS},
+    **{col: 'category' for col in CATEGORICAL_COLUMNS},
+    'persona_edad': 'UInt8',
+    'horas_primer_contacto': 'UInt16',
+}
+
+FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+}
+
+
+def detect_format(name):
+    """Guess the ingestion format from a file name, defaulting to CSV."""
+    return FORMATS.get(os.path.splitext(str(name))[1].lower(), 'csv')
+
+
+def _narrow_integer(series, dtype):
+    """Cast to a compact nullable integer dtype when every value is integral and fits."""
+    values = series.astype('float64')
+    info = np.iinfo(dtype.lower())
+    present = values.dropna()
+    if present.empty or ((present % 1 == 0).all() and present.min() >= info.min and present.max() <= info.max):
+        return values.astype(dtype)
+    return series.astype('float32')
+
+
+def parse_dates(series):
+    """Parse a date column with the configured format; unparseable values become NaT."""
+    return pd.to_datetime(series, format=DATE_FORMAT, errors='coerce')
+
+
+def apply_schema(df):
+    """Coerce the known columns of ``df`` to the declared schema, in place."""
+    for col, dtype in SCHEMA.items():
+        if col not in df.columns or str(df[col].dtype) == dtype:
+            continue
+        if dtype == 'category':
+            df[col] = df[col].astype('category')
+        elif dtype.startswith('datetime'):
+            df[col] = parse_dates(df[col])
+        else:
+            df[col] = _narrow_integer(df[col], dtype)
+    return df
+
+
+def _csv_dtypes():
+    dtype = {col: 'category' for col in CATEGORICAL_COLUMNS}
+    dtype.update({col: 'float32' for col, kind in SCHEMA.items() if kind.lower().startswith(('int', 'uint'))})
+    return dtype
+
+
+def read_csv_typed(source, **kwargs):
+    """Read a CSV with the declared dtypes instead of letting pandas infer them."""
+    df = pd.read_csv(source, dtype=_csv_dtypes(), **kwargs)
+    return apply_schema(df)
+
+
+def iter_csv_chunks(source, chunk_rows, **kwargs):
+    """Yield typed frames of at most ``chunk_rows`` rows from a CSV."""
+    with pd.read_csv(source, dtype=_csv_dtypes(), chunksize=chunk_rows, **kwargs) as reader:
+        for chunk in reader:
+            yield apply_schema(chunk)
+
+
+class _FilePrefix(io.RawIOBase):
+    """The first ``size`` bytes of a binary file, as a readable stream."""
+
+    def __init__(self, f, size):
+        self.f = f
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.f.readinto(memoryview(buffer)[:self.remaining]) if self.remaining else 0
+        self.remaining -= n
+        return n
+
+
+def read_dataset(source, fmt=None, size=None):
+    """Read a dataset from a path or file-like object in CSV, Parquet or Arrow IPC format.
+
+    ``size`` limits the read of a CSV path to its first ``size`` bytes.
+    """
+    if fmt is None:
+        fmt = detect_format(source if isinstance(source, str) else getattr(source, 'name', ''))
+
+    with timed(f'read:{fmt}') as record:
+        if fmt == 'parquet':
+            df = pd.read_parquet(source)
+        elif fmt == 'arrow':
+            df = feather.read_table(source).to_pandas()
+        elif size is not None:
+            with open(source, 'rb') as f:
+                df = pd.read_csv(io.BufferedReader(_FilePrefix(f, size)), dtype=_csv_dtypes())
+        else:
+            df = pd.read_csv(source, dtype=_csv_dtypes())
+        record['rows'] = len(df)
+    # Mostly the date parsing: categorical and integer casts are cheap next to it
+    with timed('apply_schema', rows=len(df)):
+        return apply_schema(df)
+
+
+# Working memory of a chunk relative to its raw text (parser buffers, unparsed date strings)
+# and to its parsed size (derived columns, groupby buffers)
+CSV_PARSE_OVERHEAD = 3
+CHUNK_OVERHEAD = 4
+
+
+def _rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+def estimate_row_bytes(source, nrows=1000):
+    """Estimate (in-memory bytes, raw CSV bytes) per row from the first ``nrows`` rows."""
+    _rewind(source)
+    head = read_csv_typed(source, nrows=nrows)
+    _rewind(source)
+    if head.empty:
+        return 0, 0
+    csv_bytes = len(head.to_csv(index=False).encode('utf-8')) / len(head)
+    return head.memory_usage(deep=True).sum() / len(head), csv_bytes
+
+
+def should_stream(source, mode=INGESTION_MODE, memory_ceiling_mb=STREAMING_MEMORY_MB):
+    """Whether ``source`` should be ingested chunk by chunk instead of as one frame."""
+    if mode != 'auto':
+        return mode == 'streaming'
+    if not isinstance(source, str) or detect_format(source) != 'csv':
+        return False
+    frame_bytes, csv_bytes = estimate_row_bytes(source)
+    if not csv_bytes:
+        return False
+    estimated = os.path.getsize(source) / csv_bytes * (csv_bytes * CSV_PARSE_OVERHEAD + frame_bytes * CHUNK_OVERHEAD)
+    return estimated > memory_ceiling_mb * 1024 ** 2
+
+
+def stream_csv(source, memory_ceiling_mb=STREAMING_MEMORY_MB, sample_size=STREAMING_SAMPLE_ROWS,
+               on_chunk=None, seed=0):
+    """Fold a CSV into DatasetAggregates chunk by chunk, without materializing the full frame.
+
+    Returns ``(aggregates, sample)`` where ``sample`` is a uniform random sample of
+    at most ``sample_size`` rows for the row-level views. ``on_chunk`` is called
+    with the number of rows read so far after every chunk.
+    """
+    frame_bytes, csv_bytes = estimate_row_bytes(source)
+    row_bytes = max(csv_bytes * CSV_PARSE_OVERHEAD + frame_bytes * CHUNK_OVERHEAD, 1)
+    chunk_rows = max(1000, int(memory_ceiling_mb * 1024 ** 2 / row_bytes))
+
+    rng = np.random.default_rng(seed)
+    aggregates = None
+    sample = None
+    rows_read = 0
+    for chunk in iter_csv_chunks(source, chunk_rows):
+        chunk_aggregates = DatasetAggregates.from_frame(chunk)
+        aggregates = chunk_aggregates if aggregates is None else aggregates.merge(chunk_aggregates)
+
+        # Bottom-k sampling on a random key keeps a uniform sample across chunks
+        chunk = chunk.assign(_sample_key=rng.random(len(chunk)))
+        candidates = chunk.nsmallest(sample_size, '_sample_key')
+        sample = candidates if sample is None else pd.concat([sample, candidates]).nsmallest(sample_size, '_sample_key')
+
+        rows_read += len(chunk)
+        if on_chunk is not None:
+            on_chunk(rows_read)
+
+    if sample is None:
+        return DatasetAggregates.from_frame(read_csv_typed(source, nrows=0)), pd.DataFrame()
+    # Derived columns are rebuilt lazily on the sample, with their own category order
+    sample = sample.drop(columns=['_sample_key'] + [col for col in DERIVED_COLUMNS if col in sample.columns])
+    sample = sample.sort_index()
+    for col in CATEGORICAL_COLUMNS:
+        # Chunks carry different category sets; restore a single categorical per column
+        if col in sample.columns:
+            sample[col] = sample[col].astype('object').astype('category')
+    return aggregates, sample.reset_index(drop=True)
+
+
+# Bytes just before the resume offset that must be unchanged for an append to be trusted
+TAIL_CHECK_BYTES = 4096
+
+
+def _tail_hash(f, offset):
+    f.seek(max(0, offset - TAIL_CHECK_BYTES))
+    return hashlib.sha256(f.read(offset - max(0, offset - TAIL_CHECK_BYTES))).hexdigest()
+
+
+def _read_dates(path, fmt):
+    """The typed fecha_alta column of a Parquet or Arrow file, without reading the other columns."""
+    if fmt == 'parquet':
+        dates = pd.read_parquet(path, columns=['fecha_alta'])
+    else:
+        dates = feather.read_table(path, columns=['fecha_alta']).to_pandas()
+    return apply_schema(dates)['fecha_alta']
+
+
+def _dates_hash(dates):
+    """Order-sensitive hash of a fecha_alta column, NaT included."""
+    hashes = pd.util.hash_pandas_object(dates.astype('datetime64[ns]'), index=False)
+    return hashlib.sha256(hashes.to_numpy().tobytes()).hexdigest()
+
+
+def _read_rows(path, fmt, start, stop):
+    """Rows ``start`` to ``stop`` of a Parquet or Arrow file.
+
+    Parquet row groups that end before ``start`` are not read; Arrow files are
+    memory-mapped, so only the selected rows are converted.
+    """
+    if fmt == 'parquet':
+        parquet = pq.ParquetFile(path)
+        groups, skipped = [], 0
+        for i in range(parquet.num_row_groups):
+            rows = parquet.metadata.row_group(i).num_rows
+            if not groups and skipped + rows <= start:
+                skipped += rows
+                continue
+            groups.append(i)
+        table = parquet.read_row_groups(groups) if groups else parquet.schema_arrow.empty_table()
+        table = table.slice(start - skipped, stop - start)
+    else:
+        table = feather.read_table(path, memory_map=True).slice(start, stop - start)
+    return apply_schema(table.to_pandas())
+
+
+def _csv_position(path):
+    """End of a CSV file and a hash of the bytes before it."""
+    with open(path, 'rb') as f:
+        # pandas parses every line, including a last one without a newline
+        offset = f.seek(0, os.SEEK_END)
+        return {'offset': offset, 'tail_hash': _tail_hash(f, offset)}
+
+
+def _rows_position(dates):
+    """Row count of a Parquet or Arrow file and a hash of its fecha_alta values in file order."""
+    return {'rows': len(dates), 'dates_hash': _dates_hash(dates)}
+
+
+def read_snapshot(path):
+    """Read a local file in full, returning ``(frame, position)``.
+
+    ``position`` is where the next incremental refresh resumes (see
+    ``read_new_rows``) and describes exactly the rows read: a CSV is only read
+    up to the size it had when the read started, so rows appended meanwhile
+    are left for the next refresh.
+    """
+    fmt = detect_format(path)
+    if fmt == 'csv':
+        position = _csv_position(path)
+        return read_dataset(path, fmt, size=position['offset']), position
+    df = read_dataset(path, fmt)
+    return df, _rows_position(df['fecha_alta'])
+
+
+def read_new_rows(path, position):
+    """Read only the rows added to ``path`` since ``position``, as ``(rows, new position)``.
+
+    Every format is treated as append-only. For CSV files the bytes after the
+    stored offset are parsed, provided the bytes before it are unchanged. For
+    Parquet and Arrow files the rows after the stored count are read, provided
+    the fecha_alta values of the rows before it are unchanged. Returns ``None``
+    when the file was rewritten and needs a full reload.
+    """
+    fmt = detect_format(path)
+    if fmt == 'csv':
+        offset = position.get('offset')
+        if offset is None:
+            return None
+        with open(path, 'rb') as f:
+            if f.seek(0, os.SEEK_END) < offset or _tail_hash(f, offset) != position.get('tail_hash'):
+                return None
+            f.seek(0)
+            header = f.readline()
+            f.seek(offset)
+            appended = f.read()
+            end = offset + len(appended)
+            new_position = {'offset': end, 'tail_hash': _tail_hash(f, end)}
+        # When the file ended without a newline, the next write starts by ending that line
+        appended = appended.lstrip(b'\r\n')
+        if not appended.strip():
+            return read_csv_typed(io.BytesIO(header), nrows=0), new_position
+        return read_csv_typed(io.BytesIO(header + appended)), new_position
+
+    rows = position.get('rows')
+    if rows is None:
+        return None
+    dates = _read_dates(path, fmt)
+    if len(dates) < rows or _dates_hash(dates.iloc[:rows]) != position.get('dates_hash'):
+        return None
+    return _read_rows(path, fmt, rows, len(dates)), _rows_position(dates)
+
+
+def append_rows(df, new_rows):
+    """Concatenate ``new_rows`` onto ``df``, keeping categorical columns categorical."""
+    columns = [col for col in df.columns if col in new_rows.columns]
+    df = df[columns].copy(deep=False)
+    new_rows = new_rows[columns].copy()
+    for col in columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            categories = df[col].cat.categories.union(pd.Index(new_rows[col].dropna().unique()), sort=False)
+            if len(categories) > len(df[col].cat.categories):
+                df[col] = df[col].cat.set_categories(categories)
+            new_rows[col] = pd.Categorical(new_rows[col], categories=df[col].cat.categories,
+                                           ordered=df[col].cat.ordered)
+    return pd.concat([df, new_rows], ignore_index=True)
+
+
+def convert_csv_to_parquet(csv_path, parquet_path=None):
+    """One-shot conversion of a raw CSV export into a typed Parquet file."""
+    if parquet_path is None:
+        parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    df = read_csv_typed(csv_path)
+    df.to_parquet(parquet_path, index=False)
+    return parquet_path
+
+
+def _read_csv_inferred(csv_path):
+    """The original ingestion path: inferred dtypes plus datetime coercion."""
+    df = pd.read_csv(csv_path)
+    for col in DATE_COLUMNS:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def compare_ingestion(csv_path, parquet_path):
+    """Measure load time and memory of the untyped CSV, typed CSV and Parquet paths."""
+    readers = {
+        'csv (inferred)': lambda: _read_csv_inferred(csv_path),
+        'csv (typed)': lambda: read_csv_typed(csv_path),
+        'parquet': lambda: read_dataset(parquet_path, fmt='parquet'),
+    }
+    report = {}
+    for name, reader in readers.items():
+        start = time.perf_counter()
+        df = reader()
+        report[name] = {
+            'seconds': time.perf_counter() - start,
+            'memory_mb': df.memory_usage(deep=True).sum() / 1024 ** 2,
+        }
+    return report
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python ingestion.py <data.csv> [<output.parquet>]')
+        sys.exit(1)
+
+    output = convert_csv_to_parquet(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f'Wrote {output}')
+    for name, stats in compare_ingestion(sys.argv[1], output).items():
+        print(f"{name:<16} {stats['seconds']:8.2f} s {stats['memory_mb']:10.1f} MB")
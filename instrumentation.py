@@ -0,0 +1,84 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from config import TIMING_LOG
+
+# Records kept in memory for the debug panel, across all sessions
+MAX_RECORDS = 2000
+
+_records = deque(maxlen=MAX_RECORDS)
+_log_lock = threading.Lock()
+_run = contextvars.ContextVar('run', default=None)
+_first_run = threading.Event()
+
+
+def _rss_mb():
+    """Resident memory of the process in MB, or ``None`` where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def start_run():
+    """Tag the records emitted from now on in this context (one Streamlit rerun) with a new id."""
+    run = uuid.uuid4().hex[:8]
+    _run.set(run)
+    return run
+
+
+def first_run():
+    """True for the first caller in this process only (the cold start)."""
+    with _log_lock:
+        if _first_run.is_set():
+            return False
+        _first_run.set()
+        return True
+
+
+def run_records(run=None):
+    """Records of ``run`` (the current one by default), oldest first."""
+    run = run or _run.get()
+    return [record for record in list(_records) if record.get('run') == run]
+
+
+def emit(record, log_path=TIMING_LOG):
+    """Keep ``record`` for the debug panel and append it to the JSON-lines log."""
+    record.setdefault('ts', time.time())
+    record.setdefault('run', _run.get())
+    _records.append(record)
+    if log_path:
+        line = json.dumps(record, default=str, ensure_ascii=False)
+        with _log_lock, open(log_path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+@contextmanager
+def timed(stage, **fields):
+    """Time the enclosed block and emit it as one record.
+
+    The yielded dict can be updated inside the block with facts only known
+    there (``rows``, ``cache='hit'``, ``figure_kb``...). Duration, resident
+    memory delta and any exception type are added on exit.
+    """
+    record = {'stage': stage, **fields}
+    rss = _rss_mb()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        record['seconds'] = round(time.perf_counter() - start, 6)
+        end_rss = _rss_mb()
+        if rss is not None and end_rss is not None:
+            record['memory_delta_mb'] = round(end_rss - rss, 3)
+        emit(record)
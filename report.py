@@ -0,0 +1,141 @@
+import io
+import queue
+import re
+import threading
+import unicodedata
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import REPORT_WORKERS
+
+# Groupings exported as CSV tables with every report
+REPORT_GROUPINGS = [
+    ('aseguradora',),
+    ('estado',),
+    ('aseguradora', 'estado'),
+    ('aseguradora', 'recomendacion'),
+    ('aseguradora', 'age_group'),
+]
+
+
+def slugify(text):
+    """File-name friendly version of a view or figure title."""
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-zA-Z0-9]+', '_', text).strip('_').lower()
+
+
+class KaleidoPool:
+    """A fixed set of kaleido scopes, each with its own long-lived Chromium process.
+
+    Starting kaleido is the slow part of an export, so the scopes are created
+    once and reused; ``render_many`` spreads figures over them with one thread
+    per scope.
+    """
+
+    def __init__(self, workers=REPORT_WORKERS):
+        import plotly.io as pio
+        from kaleido.scopes.plotly import PlotlyScope
+
+        # Reuse the local plotly.js/MathJax paths plotly configures for its own scope
+        default = pio.kaleido.scope
+        self.workers = max(1, workers)
+        self._scopes = queue.Queue()
+        for _ in range(self.workers):
+            self._scopes.put(PlotlyScope(plotlyjs=default.plotlyjs, mathjax=default.mathjax))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='kaleido')
+
+    def render(self, fig, fmt='png'):
+        """Render one figure with whichever scope is free."""
+        scope = self._scopes.get()
+        try:
+            return scope.transform(fig, format=fmt)
+        finally:
+            self._scopes.put(scope)
+
+    def render_many(self, jobs, on_progress=None):
+        """Render ``{name: (fig, fmt)}`` concurrently and return ``{name: bytes}``.
+
+        ``on_progress(done, total)`` is called from the calling thread after each
+        figure, so it can safely update Streamlit elements.
+        """
+        futures = {self._executor.submit(self.render, fig, fmt): name for name, (fig, fmt) in jobs.items()}
+        results = {}
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if on_progress is not None:
+                on_progress(done, len(futures))
+        return results
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_kaleido_pool():
+    """Process-wide pool shared by every export."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = KaleidoPool()
+        return _default_pool
+
+
+def collect_report(visualizer, groupings=REPORT_GROUPINGS):
+    """Every figure of every view plus the tablas results.
+
+    Returns ``(figures, tables)`` as ``{name: fig}`` and ``{name: DataFrame}``.
+    """
+    figures = {}
+    for view in visualizer.VIEWS:
+        view_figures, _ = visualizer.build_view(view)
+        for i, fig in enumerate(view_figures, start=1):
+            figures[f'{slugify(view)}_{i}'] = fig
+
+    tables = {}
+    for columns in groupings:
+        if visualizer.sampled and not visualizer.aggregates.covers(columns):
+            continue
+        view_figures, table = visualizer.build_view('tablas', tuple(columns))
+        name = f"tablas_{'_'.join(columns)}"
+        tables[name] = table
+        for i, fig in enumerate(view_figures, start=1):
+            figures[f'{name}_{i}'] = fig
+    return figures, tables
+
+
+def images_to_pdf(images):
+    """Combine PNG images into one multi-page PDF."""
+    from PIL import Image
+
+    pages = [Image.open(io.BytesIO(data)).convert('RGB') for data in images]
+    buffer = io.BytesIO()
+    if pages:
+        pages[0].save(buffer, format='PDF', save_all=True, append_images=pages[1:])
+    return buffer.getvalue()
+
+
+def build_report(visualizer, formats=('png',), include_pdf=True, groupings=REPORT_GROUPINGS,
+                 pool=None, on_progress=None):
+    """Render the full report and return it as zip archive bytes.
+
+    The archive holds one file per figure and format, one CSV per tablas
+    grouping and, with ``include_pdf``, ``report.pdf`` with every figure as a
+    page (rendered as PNG even when PNG is not among ``formats``).
+    """
+    pool = pool or get_kaleido_pool()
+    figures, tables = collect_report(visualizer, groupings)
+
+    render_formats = set(formats) | ({'png'} if include_pdf else set())
+    jobs = {(name, fmt): (fig, fmt) for name, fig in figures.items() for fmt in sorted(render_formats)}
+    rendered = pool.render_many(jobs, on_progress)
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for (name, fmt), data in rendered.items():
+            if fmt in formats:
+                archive.writestr(f'{fmt}/{name}.{fmt}', data)
+        for name, table in tables.items():
+            archive.writestr(f'tablas/{name}.csv', table.to_csv(index=False).encode('utf-8-sig'))
+        if include_pdf:
+            archive.writestr('report.pdf', images_to_pdf(rendered[(name, 'png')] for name in figures))
+    return buffer.getvalue()
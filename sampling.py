@@ -0,0 +1,101 @@
+"""Stratified samples for previewing views before their exact counts are ready.
+
+Rows are sampled separately in every ``aseguradora`` x ``estado`` stratum, so
+small insurers and rare states keep enough rows, and each sampled row carries
+the weight of the rows it stands for. Counts estimated from the sample come
+with the half-width of their confidence interval.
+"""
+import numpy as np
+
+from aggregates import DatasetAggregates, build_count_cube
+
+# Columns whose combinations are sampled separately
+STRATA = ['aseguradora', 'estado']
+
+# Rows drawn from every stratum, whatever its share (or the whole stratum if smaller)
+MIN_STRATUM_ROWS = 30
+
+# Column of per-row weights added to a sample: the rows of its stratum each sampled row stands for
+WEIGHT = '_weight'
+
+# Normal quantile of the two-sided 95% confidence intervals
+Z_95 = 1.96
+
+
+def stratified_sample(df, n_rows, strata=STRATA, seed=0):
+    """About ``n_rows`` rows of ``df`` drawn per stratum, in their original order.
+
+    Returns ``(sample, strata_table)``: the sample with a WEIGHT column, and the
+    ``population`` and ``sample`` rows of every stratum (null strata included).
+    """
+    ids = df.groupby(strata, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    population = np.bincount(ids)
+    target = np.maximum(population * n_rows / len(df), np.minimum(population, MIN_STRATUM_ROWS))
+
+    # One pass over the rows: each is kept with its stratum's rate, so no sort is needed
+    rng = np.random.default_rng(seed)
+    positions = np.flatnonzero(rng.random(len(df)) < (target / population)[ids])
+    taken = np.bincount(ids[positions], minlength=len(population))
+
+    sample = df.iloc[positions].reset_index(drop=True)
+    sample[WEIGHT] = (population / np.maximum(taken, 1))[ids[positions]]
+    first = np.unique(ids, return_index=True)[1]
+    table = df[strata].iloc[first].reset_index(drop=True).assign(population=population, sample=taken)
+    return sample, table
+
+
+def count_errors(sample_cube, strata_table, dimensions, z=Z_95):
+    """Half-width of the confidence interval of every count estimated over ``dimensions``.
+
+    Each stratum adds N² (1 - n/N) p (1 - p) / (n - 1) to a count's variance,
+    with N its rows, n its sampled rows and p the share of those in the group.
+    """
+    dimensions = list(dimensions)
+    hits = sample_cube.groupby(level=list(dict.fromkeys(dimensions + STRATA)), observed=True, dropna=False).sum()
+    cells = hits.reset_index(name='hits').merge(strata_table, on=STRATA)
+    share = cells['hits'] / cells['sample']
+    cells['variance'] = (cells['population'] ** 2 * (1 - cells['sample'] / cells['population'])
+                         * share * (1 - share) / np.maximum(cells['sample'] - 1, 1))
+    variance = cells.dropna(subset=dimensions).groupby(dimensions, observed=True)['variance'].sum()
+    return (z * np.sqrt(variance)).rename('error').reset_index()
+
+
+def _rounded(frame, column='count'):
+    # Weighted rollups hold fractional sums; they are rounded once, when read
+    frame[column] = frame[column].round().astype('int64')
+    return frame
+
+
+class SampleAggregates(DatasetAggregates):
+    """Aggregates estimated from a stratified sample.
+
+    Counts are read rounded to whole rows (except in the hierarchy, where
+    parents must stay the exact sum of their children), and ``counts`` adds an
+    ``error`` column with the half-width of each count's confidence interval.
+    """
+
+    @classmethod
+    def from_sample(cls, sample, strata_table, date_range, backend=None):
+        """Weighted aggregates of ``sample`` standing for rows spanning ``date_range``."""
+        aggregates = cls.from_frame(sample, backend, weights=WEIGHT)
+        aggregates.sample_cube = build_count_cube(sample, backend=backend)
+        aggregates.strata = strata_table
+        aggregates.date_range = date_range
+        return aggregates
+
+    def counts(self, *dimensions):
+        counts = _rounded(super().counts(*dimensions))
+        errors = count_errors(self.sample_cube, self.strata, dimensions)
+        return counts.merge(errors, on=list(dimensions), how='left')
+
+    def distinct_counts(self, column):
+        return _rounded(super().distinct_counts(column))
+
+    def histogram(self, column, by, bins, binning='fixed'):
+        return _rounded(super().histogram(column, by, bins, binning))
+
+    def trend(self, date_col, freq, by=()):
+        return super().trend(date_col, freq, by).round().astype('int64')
+
+    def weekday_hours(self, date_col):
+        return super().weekday_hours(date_col).round().astype('int64')
@@ -0,0 +1,118 @@
+"""Synthetic datasets with the dashboard schema, for development and benchmarks.
+
+    python synthetic.py 1000000 fake_data_grande.csv
+    python synthetic.py 10000000 big.parquet --seed 7
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Category values with their relative frequencies; aseguradoras follow a long tail
+ASEGURADORAS = {
+    'Mapfre': 24, 'Allianz': 17, 'AXA': 13, 'Generali': 10, 'Sanitas': 8, 'DKV': 7, 'Adeslas': 6,
+    'Asisa': 4, 'Caser': 3, 'Zurich': 2.5, 'Mutua Madrileña': 2, 'Liberty': 1.5, 'Reale': 1, 'Ocaso': 1,
+}
+ESTADOS = {'nuevo': 15, 'contactado': 30, 'en gestión': 20, 'contratado': 15, 'perdido': 15, 'descartado': 5}
+FRANJAS_HORARIAS = {'mañana': 45, 'tarde': 40, 'noche': 15}
+RECOMENDACIONES = {'básico': 35, 'estándar': 30, 'completo': 20, 'premium': 10, 'familiar': 5}
+GENEROS = {'F': 51, 'M': 49}
+ESTADOS_PRIMER_MOVIMIENTO = {'llamada': 50, 'email': 25, 'whatsapp': 15, 'visita': 10}
+
+# Share of rows with a missing value
+NULL_RATES = {
+    'recomendacion': 0.15,
+    'persona_edad': 0.02,
+    'persona_genero': 0.03,
+    'fecha_primer_contacto': 0.10,  # never contacted: no contact hours or first movement either
+    'fecha_ultimo_estado': 0.05,
+}
+
+
+def _choice(rng, weights, n):
+    values = list(weights)
+    p = np.array(list(weights.values()), dtype=float)
+    return pd.Categorical.from_codes(rng.choice(len(values), size=n, p=p / p.sum()), categories=values)
+
+
+def _with_nulls(rng, values, rate):
+    mask = rng.random(len(values)) < rate
+    if isinstance(values, pd.Categorical):
+        values = values.copy()
+        values[mask] = np.nan
+        return values
+    return pd.Series(values, dtype='Int64' if np.issubdtype(np.asarray(values).dtype, np.integer) else None).mask(mask)
+
+
+def generate(n_rows, seed=0, start='2023-01-01', days=365):
+    """One frame of ``n_rows`` synthetic leads with fecha_alta spread over ``days``."""
+    rng = np.random.default_rng(seed)
+    # More leads on weekdays and during office hours
+    day = rng.integers(0, days, n_rows)
+    hour = np.clip(rng.normal(13, 4, n_rows), 0, 23.99)
+    alta = pd.Series(pd.Timestamp(start) + pd.to_timedelta(day, unit='D') + pd.to_timedelta(hour * 3600, unit='s'))
+    weekday = alta.dt.dayofweek.to_numpy()
+    moved = (weekday >= 5) & (rng.random(n_rows) >= 0.4)
+    alta = alta.where(~moved, alta + pd.to_timedelta(7 - weekday + rng.integers(0, 5, n_rows), unit='D'))
+
+    horas = rng.gamma(1.2, 18, n_rows)
+    contacted = rng.random(n_rows) >= NULL_RATES['fecha_primer_contacto']
+    primer_contacto = (alta + pd.to_timedelta(horas * 3600, unit='s')).where(contacted)
+    ultimo_estado = primer_contacto.fillna(alta) + pd.to_timedelta(rng.exponential(120, n_rows) * 3600, unit='s')
+    primer_movimiento = _choice(rng, ESTADOS_PRIMER_MOVIMIENTO, n_rows)
+    primer_movimiento[~contacted] = np.nan
+
+    df = pd.DataFrame({
+        'fecha_alta': alta,
+        'fecha_primer_contacto': primer_contacto,
+        'fecha_ultimo_estado': _with_nulls(rng, ultimo_estado, NULL_RATES['fecha_ultimo_estado']),
+        'persona_edad': _with_nulls(rng, np.clip(rng.normal(44, 15, n_rows), 16, 95).round().astype('int64'), NULL_RATES['persona_edad']),
+        'persona_genero': _with_nulls(rng, _choice(rng, GENEROS, n_rows), NULL_RATES['persona_genero']),
+        'aseguradora': _choice(rng, ASEGURADORAS, n_rows),
+        'estado': _choice(rng, ESTADOS, n_rows),
+        'franja_horaria': _choice(rng, FRANJAS_HORARIAS, n_rows),
+        'estado_primer_movimiento': primer_movimiento,
+        'recomendacion': _with_nulls(rng, _choice(rng, RECOMENDACIONES, n_rows), NULL_RATES['recomendacion']),
+        'horas_primer_contacto': pd.Series(horas.round().astype('int64'), dtype='Int64').where(contacted),
+    })
+    return df.sort_values('fecha_alta', ignore_index=True)
+
+
+def write_dataset(path, n_rows, seed=0, chunk_rows=1_000_000):
+    """Write ``n_rows`` synthetic rows to a CSV or Parquet ``path``, one chunk at a time.
+
+    Chunks cover consecutive date ranges, like a file that grows over the year,
+    and memory stays bounded by ``chunk_rows`` whatever the size.
+    """
+    n_chunks = max(1, -(-n_rows // chunk_rows))
+    boundaries = np.linspace(0, 365, n_chunks + 1).astype(int)
+    parquet = os.path.splitext(path)[1].lower() == '.parquet'
+    writer = None
+    try:
+        for i in range(n_chunks):
+            rows = min(chunk_rows, n_rows - i * chunk_rows)
+            start = pd.Timestamp('2023-01-01') + pd.Timedelta(days=int(boundaries[i]))
+            df = generate(rows, seed=seed + i, start=start, days=max(1, boundaries[i + 1] - boundaries[i]))
+            if parquet:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            else:
+                df.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False,
+                          date_format='%Y-%m-%d %H:%M:%S')
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic dataset with the dashboard schema.')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path', help='output .csv or .parquet file')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(f'Wrote {write_dataset(args.path, args.rows, seed=args.seed)}')
@@ -0,0 +1,48 @@
+import math
+
+# Label of the bucket summing every group outside the top N
+OTHER_LABEL = 'Otros'
+
+
+def sort_groups(group_df, by='count', ascending=False):
+    """``group_df`` ordered by ``by``; ties keep their current order."""
+    return group_df.sort_values(by, ascending=ascending, kind='stable', ignore_index=True)
+
+
+def sort_order(group_df, by='count', ascending=False):
+    """Row positions that put ``group_df`` in ``sort_groups`` order, without copying its rows."""
+    return group_df[by].reset_index(drop=True).sort_values(ascending=ascending, kind='stable').index.to_numpy()
+
+
+def page_count(n_rows, page_size):
+    return max(1, math.ceil(n_rows / page_size))
+
+
+def page(group_df, number, page_size, order=None):
+    """Rows of the 1-based page ``number``, taken in ``order`` (row positions) when given."""
+    start = (number - 1) * page_size
+    if order is not None:
+        return group_df.iloc[order[start:start + page_size]]
+    return group_df.iloc[start:start + page_size]
+
+
+def top_groups(group_df, columns, n, other=OTHER_LABEL):
+    """Counts per ``columns`` keeping the ``n`` largest values of each column.
+
+    Values outside the top ``n`` (by total count) are relabelled ``other`` and
+    summed, so the result has at most ``(n + 1) ** len(columns)`` rows.
+    """
+    columns = list(columns)
+    capped = group_df[columns + ['count']].copy()
+    for col in columns:
+        totals = capped.groupby(col, observed=True)['count'].sum()
+        if len(totals) > n:
+            values = capped[col].astype(object)
+            capped[col] = values.where(values.isin(totals.nlargest(n).index), other)
+    capped = capped.groupby(columns, observed=True, sort=False)['count'].sum().reset_index()
+    return sort_groups(capped)
+
+
+def to_csv_bytes(df):
+    """UTF-8 (with BOM) CSV of ``df``, encoded in one pass when the download is requested."""
+    return df.to_csv(index=False).encode('utf-8-sig')
@@ -0,0 +1,115 @@
+"""Incremental refreshes must read every appended row exactly once."""
+import pandas as pd
+import pyarrow.feather as feather
+import pytest
+
+import ingestion
+from cache import DatasetCache
+from dataset import load_dataset
+from ingestion import read_new_rows, read_snapshot
+from synthetic import generate
+
+
+def write_csv(df, path, newline=True):
+    text = df.to_csv(index=False, date_format='%Y-%m-%d %H:%M:%S')
+    path.write_text(text if newline else text.rstrip('\n'))
+
+
+def append_csv(df, path):
+    with open(path, 'a') as f:
+        f.write(df.to_csv(index=False, header=False, date_format='%Y-%m-%d %H:%M:%S'))
+
+
+def write_rows(df, path):
+    if path.suffix == '.parquet':
+        df.to_parquet(path, index=False, row_group_size=200)
+    else:
+        feather.write_feather(df, path)
+
+
+@pytest.mark.parametrize('newline', [True, False])
+def test_csv_append_after_last_line(tmp_path, newline):
+    path = tmp_path / 'leads.csv'
+    base, new = generate(500), generate(50, seed=1)
+    write_csv(base, path, newline)
+    df, position = read_snapshot(str(path))
+    assert len(df) == len(base)
+
+    with open(path, 'a') as f:
+        # A writer appending to a file without a final newline first ends the last line
+        f.write('' if newline else '\n')
+    append_csv(new, path)
+    rows, position = read_new_rows(str(path), position)
+    assert len(rows) == len(new)
+    assert read_new_rows(str(path), position)[0].empty
+
+
+def test_csv_rows_appended_during_the_read_are_left_for_the_next_refresh(tmp_path, monkeypatch):
+    path = tmp_path / 'leads.csv'
+    base, new = generate(500), generate(50, seed=1)
+    write_csv(base, path)
+    read_dataset = ingestion.read_dataset
+
+    def read_while_appending(*args, **kwargs):
+        append_csv(new, path)
+        return read_dataset(*args, **kwargs)
+
+    monkeypatch.setattr(ingestion, 'read_dataset', read_while_appending)
+    df, position = read_snapshot(str(path))
+    monkeypatch.undo()
+    assert len(df) == len(base)
+    assert len(read_new_rows(str(path), position)[0]) == len(new)
+
+
+def test_csv_rewrite_needs_a_full_reload(tmp_path):
+    path = tmp_path / 'leads.csv'
+    write_csv(generate(500), path)
+    _, position = read_snapshot(str(path))
+    write_csv(generate(600, seed=1), path)
+    assert read_new_rows(str(path), position) is None
+
+
+@pytest.mark.parametrize('suffix', ['.parquet', '.arrow'])
+def test_rows_tied_with_the_last_date_are_kept(tmp_path, suffix):
+    path = tmp_path / f'leads{suffix}'
+    base = generate(500)
+    last = base['fecha_alta'].max()
+    tied = generate(20, seed=1).assign(fecha_alta=last)
+    undated = generate(5, seed=2).assign(fecha_alta=pd.NaT)
+    write_rows(base, path)
+    _, position = read_snapshot(str(path))
+
+    write_rows(pd.concat([base, tied, undated], ignore_index=True), path)
+    rows, position = read_new_rows(str(path), position)
+    assert len(rows) == len(tied) + len(undated)
+    assert position['rows'] == len(base) + len(tied) + len(undated)
+
+
+@pytest.mark.parametrize('suffix', ['.parquet', '.arrow'])
+def test_rows_rewrite_needs_a_full_reload(tmp_path, suffix):
+    path = tmp_path / f'leads{suffix}'
+    base = generate(500)
+    write_rows(base, path)
+    _, position = read_snapshot(str(path))
+
+    changed = base.copy()
+    changed.loc[3, 'fecha_alta'] += pd.Timedelta(hours=1)
+    write_rows(pd.concat([changed, generate(20, seed=1)], ignore_index=True), path)
+    assert read_new_rows(str(path), position) is None
+
+
+@pytest.mark.parametrize('newline', [True, False])
+def test_refresh_counts_every_row_once(tmp_path, newline):
+    path = tmp_path / 'leads.csv'
+    base, new = generate(500), generate(50, seed=1)
+    write_csv(base, path, newline)
+    cache = DatasetCache(str(tmp_path / 'cache'))
+    load_dataset(str(path), cache)
+    cache.flush()
+
+    with open(path, 'a') as f:
+        f.write('' if newline else '\n')
+    append_csv(new, path)
+    # A new cache instance only sees the previous version through the disk tier
+    df, _, meta = load_dataset(str(path), DatasetCache(str(tmp_path / 'cache')))
+    assert len(df) == meta['aggregates'].n_rows == len(base) + len(new)
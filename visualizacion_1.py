@@ -1,16 +1,87 @@
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import streamlit as st
-import kaleido
+import plotly.io as pio
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, wraps
+from features import available_columns, ensure_columns
+from aggregates import DatasetAggregates, group_counts, node_path
+from cache import result_nbytes
+from instrumentation import timed
+from backends import get_backend
+from config import AGGREGATION_BACKEND, FIGURE_WORKERS, MAX_POINTS_PER_FIGURE, NUMERIC_BINNING, NUMERIC_BINS, SUNBURST_MAX_DEPTH, TABLE_TOP_N
+from tables import sort_groups, top_groups
+
+# Shared by every visualizer; figures are independent, so a view takes as long as its slowest one
+_figure_pool = ThreadPoolExecutor(max_workers=FIGURE_WORKERS, thread_name_prefix='figures')
+
+def _warm_up_template():
+    """Resolve the template defaults plotly express reads, before builders run concurrently.
+
+    plotly builds a template's nested properties on first access, without a
+    lock, and two threads doing that first read at once fail with
+    ``ValueError: Invalid value``. Covers what ``px`` looks up on every call:
+    the colorway and sequential colorscale of the layout, ``marker.symbol`` and
+    ``line.dash`` of the scatter traces (scatter and line charts) and
+    ``marker.pattern.shape`` of the bar traces (bar charts). Figures built with
+    ``go`` directly (box, sunburst, binned histograms) do not read the template
+    until they are serialized.
+    """
+    template = pio.templates[pio.templates.default]
+    return (
+        template.layout.colorway,
+        template.layout.colorscale.sequential,
+        [(scatter.marker.symbol, scatter.line.dash) for scatter in template.data.scatter],
+        [bar.marker.pattern.shape for bar in template.data.bar],
+    )
+
+# Run once at import, on the importing thread
+_warm_up_template()
+
+def cached_view(method):
+    """Serve a view's ``(figures, result)`` from the figure cache.
+
+    The view itself returns one zero-argument builder per figure; on a cache
+    miss the builders run concurrently on the figure pool.
+    """
+    view = method.__name__.lstrip('_')
+
+    @wraps(method)
+    def wrapper(self, *params):
+        return self._build_cached(view, method, params)
+    wrapper.view = view
+    return wrapper
 
 class DataVisualizer:
-    def __init__(self, df):
-        self.df = df.copy()  # Use a copy of the DataFrame to avoid modifying the original
-        self.df['fecha_alta'] = pd.to_datetime(self.df['fecha_alta'])
-        self.start_date = self.df['fecha_alta'].min().strftime('%Y/%m/%d')
-        self.end_date = self.df['fecha_alta'].max().strftime('%Y/%m/%d')
-        self.df_cleaned = self.df.dropna(subset=['recomendacion'])
+    def __init__(self, df, fingerprint=None, figure_cache=None, aggregates=None, sampled=False, date_range=None,
+                 bins=NUMERIC_BINS, binning=NUMERIC_BINNING, max_points=MAX_POINTS_PER_FIGURE,
+                 backend=AGGREGATION_BACKEND, sunburst_depth=SUNBURST_MAX_DEPTH, weights=None):
+        self.fingerprint = fingerprint
+        self.sunburst_depth = sunburst_depth
+        # Engine for the grouped counts computed from the rows (see backends.py)
+        self.backend = get_backend(backend)
+        self.figure_cache = figure_cache
+        self.bins = bins
+        self.binning = binning
+        self.max_points = max_points
+        # In streaming mode ``df`` is only a sample and the counts come from ``aggregates``
+        self.sampled = sampled
+        # In preview mode ``df`` is a weighted sample and this names its weight column
+        self.weights = weights
+        # Serialized size of every figure list this visualizer built, by cache key
+        self.figure_sizes = {}
+        with timed('visualizer_init', rows=len(df)):
+            # A shallow handle on the shared frame: derived columns are added to this
+            # visualizer only, the existing columns are never copied
+            self.df = df.copy(deep=False)
+            if not pd.api.types.is_datetime64_any_dtype(self.df['fecha_alta']):
+                self.df['fecha_alta'] = pd.to_datetime(self.df['fecha_alta'])
+            if aggregates is not None:
+                self.aggregates = aggregates
+            # An active date filter is shown as selected, otherwise the data's own range
+            start, end = date_range if date_range is not None else self.aggregates.date_range
+        self.start_date = start.strftime('%Y/%m/%d')
+        self.end_date = end.strftime('%Y/%m/%d')
 
         self.annotation = dict(
             x=0.1, y=1.05, showarrow=False,
@@ -22,137 +93,234 @@ class DataVisualizer:
             width=1000,
             height=800
         )
+        self.preview_badge = dict(
+            x=1, y=1.05, xanchor='right', showarrow=False,
+            text='Vista previa: estimación sobre una muestra',
+            xref='paper', yref='paper',
+            font=dict(size=12, color='firebrick')
+        )
+
+    # Views that take no parameters, in sidebar order
+    VIEWS = [
+        'distribución_de_aseguradoras',
+        'estado_por_aseguradora',
+        'aseguradora_por_franja_horaria',
+        'distribución_de_edades',
+        'distribución_groupo_de_edades',
+        'primer_contacto_por_aseguradora',
+        'distribucion_de_recomendaciones_por_aseguradora',
+        'recomendacion_sunburst',
+        'tendencias',
+        'actividad_por_dia_y_hora',
+    ]
+
+    # Levels of the recomendacion sunburst, outermost last
+    SUNBURST_PATH = ('aseguradora', 'recomendacion', 'age_group', 'persona_genero')
+
+    # Date columns of the time views, with what each of them counts
+    TREND_DATES = {
+        'fecha_alta': 'Altas',
+        'fecha_primer_contacto': 'Primeros contactos',
+        'fecha_ultimo_estado': 'Cambios de estado',
+    }
+    # Periods the trend lines can be resampled to
+    TREND_PERIODS = {'D': 'día', 'W': 'semana', 'M': 'mes'}
+
+    def _build_cached(self, view, method, params):
+        key = (view, params, self.fingerprint)
+        with timed(f'view:{view}', params=params, rows=len(self.df)) as record:
+            built = self.figure_cache.get(key) if self.figure_cache is not None else None
+            if self.figure_cache is not None:
+                record['cache'] = 'miss' if built is None else 'hit'
+            if built is None:
+                builders, result = method(self, *params)
+                figures = self._build_figures(builders)
+                built = figures, result
+                self.figure_sizes[key] = result_nbytes(figures)
+                if self.figure_cache is not None:
+                    self.figure_cache.put(key, built, nbytes=self.figure_sizes[key] + result_nbytes(result))
+            if key in self.figure_sizes:
+                record['figure_kb'] = round(self.figure_sizes[key] / 1024, 1)
+        return built
+
+    def _build_figures(self, builders):
+        """Run the figure builders of one view concurrently, keeping their order."""
+        self.aggregates  # Build the shared cube once, before the threads race for it
+        if len(builders) < 2:
+            return [build() for build in builders]
+        return list(_figure_pool.map(lambda build: build(), builders))
+
+    def build_view(self, view, *params):
+        """Return a view's ``(figures, result)`` by name."""
+        return (getattr(self, '_' + view, None) or getattr(self, view))(*params)
+
+    def _styled(self, fig):
+        """Add the date range annotation and the common layout to ``fig``."""
+        fig.add_annotation(**self.annotation)
+        if self.weights is not None:
+            fig.add_annotation(**self.preview_badge)
+        fig.update_layout(**self.layout)
+        return fig
+
+    @cached_property
+    def aggregates(self):
+        """Count cube over the categorical dimensions, built once per dataset."""
+        return DatasetAggregates.from_frame(self.df, self.backend, self.weights)
+
+    def _group_counts(self, groupby_columns):
+        """Row counts per group, served from the count cube whenever it covers the columns."""
+        if self.aggregates.covers(groupby_columns):
+            return self.aggregates.counts(*groupby_columns)
+        ensure_columns(self.df, groupby_columns)
+        counts = group_counts(self.df, groupby_columns, self.backend, self.weights, dropna=True)
+        # Weighted sums (preview mode) are shown as whole rows
+        return counts.round().astype('int64').reset_index()
+
+    def _count_bar(self, x, color, title):
+        """Stacked bar chart of row counts, equivalent to px.histogram on the raw rows.
 
-    def tablas(self, groupby_columns):
-    # Validate if the provided columns are in the DataFrame
-        invalid_columns = [col for col in groupby_columns if col not in self.df.columns]
+        Estimated counts (preview mode) get their confidence interval as error bars.
+        """
+        counts = self.aggregates.counts(*dict.fromkeys([x, color]))
+        return px.bar(counts, x=x, y='count', color=color, title=title,
+                      error_y='error' if 'error' in counts else None)
+
+    def _binned_histogram(self, column, title, by='aseguradora'):
+        """Stacked histogram of a numeric column, binned on the server."""
+        binned = self.aggregates.histogram(column, [by], self.bins, self.binning)
+        fig = go.Figure()
+        for group, rows in binned.groupby(by, observed=True, sort=False):
+            fig.add_trace(go.Bar(
+                x=(rows['bin_start'] + rows['bin_end']) / 2,
+                y=rows['count'],
+                width=rows['bin_end'] - rows['bin_start'],
+                customdata=rows[['bin_start', 'bin_end']],
+                hovertemplate='%{customdata[0]:.4g} - %{customdata[1]:.4g}<br>count=%{y}',
+                name=str(group),
+            ))
+        fig.update_layout(title=title, barmode='stack', bargap=0,
+                          xaxis_title=column, yaxis_title='count', legend_title=by)
+        return fig
+
+    def _box(self, x, y, color, title):
+        """Box plot drawn from server-side quartiles instead of the raw rows."""
+        stats = self.aggregates.box(y, [color, x])
+        fig = go.Figure()
+        for group, rows in stats.groupby(color, observed=True, sort=False):
+            fig.add_trace(go.Box(
+                x=rows[x].astype(str), q1=rows['q1'], median=rows['median'], q3=rows['q3'],
+                lowerfence=rows['lowerfence'], upperfence=rows['upperfence'], name=str(group),
+            ))
+        fig.update_layout(title=title, boxmode='group', xaxis_title=x, yaxis_title=y, legend_title=color)
+        return fig
+
+    def _decimated(self, columns):
+        """Evenly strided subset of the rows with values, capped at ``max_points``."""
+        # Nullable integer columns (e.g. UInt8 ages) hold pd.NA, which px.scatter cannot color by
+        frame = self.df[columns].dropna()
+        if len(frame) > self.max_points:
+            frame = frame.iloc[::-(-len(frame) // self.max_points)]
+        return frame
+
+    def tablas(self, groupby_columns, top_n=TABLE_TOP_N):
+        """Return ``(figures, table)`` of row counts per group, largest groups first.
+
+        The chart only draws the ``top_n`` largest values of each column; the
+        table holds every group. Raises ``ValueError`` for unknown columns, or
+        for columns outside the count cube when only a sample of the rows is
+        loaded.
+        """
+        # Validate if the provided columns are in the DataFrame
+        invalid_columns = [col for col in groupby_columns if col not in available_columns(self.df)]
         if invalid_columns:
-            st.error(f"The following columns are not in the DataFrame: {', '.join(invalid_columns)}")
-            return pd.DataFrame()  # Return an empty DataFrame on error
+            raise ValueError(f"The following columns are not in the DataFrame: {', '.join(invalid_columns)}")
+
+        if self.sampled and not self.aggregates.covers(groupby_columns):
+            raise ValueError('Only these columns can be grouped on a streamed dataset: '
+                             f"{', '.join(self.aggregates.dimensions)}")
+
+        return self._tablas(tuple(groupby_columns), top_n)
+
+    @cached_view
+    def _tablas(self, groupby_columns, top_n=TABLE_TOP_N):
+        groupby_columns = list(groupby_columns)
 
         # Group by the selected columns and count the occurrences
-        group_df = self.df.groupby(groupby_columns).size().reset_index(name='count')
-
-        # Create and display the table figure
-        table_fig = go.Figure(data=[go.Table(
-            header=dict(values=list(group_df.columns),
-                        fill_color='paleturquoise',
-                        align='left'),
-            cells=dict(values=[group_df[col] for col in group_df.columns],
-                    fill_color='lavender',
-                    align='left'))
-        ])
-
-        # Show the table in Streamlit
-        st.plotly_chart(table_fig)
-        
-        if len(groupby_columns) == 1:
-            group_data = self.df.groupby(groupby_columns).size()
-            
-            fig = px.bar(group_data, 
-                         x=group_data.index, 
-                         y=group_data.values,
-                         color=group_data.index, 
-                         title='Grouped Bar Plot', 
-                         labels={groupby_columns[0]: 'Values', 'count': 'Count'},
-                         color_discrete_sequence=px.colors.qualitative.Plotly)
-        else:
-            group_data = self.df.groupby(groupby_columns[0:-1])[groupby_columns[-1]].value_counts()
-            group_df = group_data.reset_index(name='count')
-        
-            group_df.sort_values(by=groupby_columns[0], ascending=False, inplace=True)
-
-            fig = px.bar(group_df, 
+        group_df = sort_groups(self._group_counts(groupby_columns))
+
+        def bar_figure():
+            if len(groupby_columns) == 1:
+                return px.bar(top_groups(group_df, groupby_columns, top_n), 
+                             x=groupby_columns[0], 
+                             y='count',
+                             color=groupby_columns[0], 
+                             title='Grouped Bar Plot', 
+                             labels={groupby_columns[0]: 'Values', 'count': 'Count'},
+                             color_discrete_sequence=px.colors.qualitative.Plotly)
+            # Only the plotted columns are kept, so the bar count stays bounded
+            plotted = groupby_columns[-2:]
+            return px.bar(top_groups(group_df, plotted, top_n), 
                             x=groupby_columns[-1],   # Column_4 values
                             y='count',       # Count of occurrences
                             color=groupby_columns[-2], # Column_10 for color differentiation
                             barmode='group', # Grouped bar mode
                             title='Grouped Bar Plot',
                             labels={groupby_columns[-1]: 'Values', 'count': 'Count', groupby_columns[-2]: 'Group'},
-                            hover_data = groupby_columns[0],
                             height=600,
-                            width=1000) # Hover data)
-    
-
-        # Display the plot in Streamlit
-
-        st.plotly_chart(fig)
+                            width=1000)
 
-        return group_df
+        return [bar_figure], group_df
 
+    @cached_view
     def distribución_de_aseguradoras(self):
-        fig = px.pie(self.df, names='aseguradora', title='Distribución de aseguradoras')
-        fig.add_annotation(x=0.5, y=1.15, 
-                        showarrow=False, text=f'{self.start_date} - {self.end_date}', 
-                        xref='paper', yref='paper', font=dict(size=15, color='black'))
-        st.plotly_chart(fig)
+        def pie_figure():
+            fig = px.pie(self.aggregates.counts('aseguradora'), names='aseguradora', values='count', title='Distribución de aseguradoras')
+            fig.add_annotation(x=0.5, y=1.15, 
+                            showarrow=False, text=f'{self.start_date} - {self.end_date}', 
+                            xref='paper', yref='paper', font=dict(size=15, color='black'))
+            return fig
 
-        fig = px.histogram(self.df, x='aseguradora', title='Distribución de aseguradoras', color='aseguradora')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
+        return [
+            pie_figure,
+            lambda: self._styled(self._count_bar(x='aseguradora', color='aseguradora', title='Distribución de aseguradoras')),
+        ], None
 
+    @cached_view
     def estado_por_aseguradora(self):
-        fig = px.histogram(self.df, x='estado', title='Distribución de estados por aseguradora', color='aseguradora')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
-
-        fig = px.histogram(self.df, x='aseguradora', title='Distribución de aseguradoras por estado', color='estado')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
+        return [
+            lambda: self._styled(self._count_bar(x='estado', color='aseguradora', title='Distribución de estados por aseguradora')),
+            lambda: self._styled(self._count_bar(x='aseguradora', color='estado', title='Distribución de aseguradoras por estado')),
+        ], None
 
+    @cached_view
     def aseguradora_por_franja_horaria(self):
-        fig = px.histogram(self.df, x='aseguradora', title='Distribución de aseguradoras por franja horaria', color='franja_horaria')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
-
-        fig = px.histogram(self.df, x='franja_horaria', title='Distribución de franjas horarias por aseguradora', color='aseguradora')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
+        return [
+            lambda: self._styled(self._count_bar(x='aseguradora', color='franja_horaria', title='Distribución de aseguradoras por franja horaria')),
+            lambda: self._styled(self._count_bar(x='franja_horaria', color='aseguradora', title='Distribución de franjas horarias por aseguradora')),
+        ], None
 
+    @cached_view
     def distribución_de_edades(self):
-        fig = px.histogram(self.df, x='persona_edad', title='Distribución de edades', color='aseguradora')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
-
-        fig = px.scatter(self.df, x='persona_edad', title='Distribución de edad', color='persona_edad')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
-
-        # Aggregate the data
-        age_counts = self.df['persona_edad'].value_counts().reset_index()
-        age_counts.columns = ['persona_edad', 'count']
-
-        fig = px.scatter(age_counts, x='persona_edad', y='count',
-                        title='Distribución de edad',
-                        color='persona_edad')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
+        return [
+            lambda: self._styled(self._binned_histogram('persona_edad', title='Distribución de edades')),
+            # Individual points: WebGL trace over a decimated subset of the rows
+            lambda: self._styled(px.scatter(self._decimated(['persona_edad']), x='persona_edad', title='Distribución de edad',
+                                            color='persona_edad', render_mode='webgl')),
+            # Aggregate the data
+            lambda: self._styled(px.scatter(self.aggregates.distinct_counts('persona_edad'), x='persona_edad', y='count',
+                                            title='Distribución de edad',
+                                            color='persona_edad')),
+        ], None
 
+    @cached_view
     def distribución_groupo_de_edades(self):
-        fig = px.histogram(self.df, x='age_group', title='Distribución de edades por grupo', color='aseguradora')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
-
-        fig = px.histogram(self.df, x='aseguradora', title='Distribución de edades por aseguradora', color='age_group')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
+        return [
+            lambda: self._styled(self._count_bar(x='age_group', color='aseguradora', title='Distribución de edades por grupo')),
+            lambda: self._styled(self._count_bar(x='aseguradora', color='age_group', title='Distribución de edades por aseguradora')),
+        ], None
 
+    @cached_view
     def primer_contacto_por_aseguradora(self):
-        fig = px.histogram(self.df, x='horas_primer_contacto', title='Distribución de horas de primer contacto por aseguradora', color='aseguradora')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
-
         # hours_counts = self.df['horas_entre_alta_y_primer_contacto'].value_counts().reset_index()
         # hours_counts.columns = ['horas_entre_alta_y_primer_contacto', 'count']
 
@@ -163,29 +331,89 @@ class DataVisualizer:
         # fig.update_layout(**self.layout)
         # st.plotly_chart(fig)
 
-    def distribucion_de_recomendaciones_por_aseguradora(self):
-        fig = px.histogram(self.df, x='recomendacion', title='Distribución de recomendaciones por aseguradora', color='aseguradora')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
-
-        fig = px.histogram(self.df, x='recomendacion', title='Distribución de recomendaciones por grupo de edad', color='age_group')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
-
-        fig = px.box(self.df, x='recomendacion', y='persona_edad', title='Distribución de recomendaciones por edad y aseguradora', color='aseguradora')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
+        return [
+            lambda: self._styled(self._binned_histogram('horas_primer_contacto', title='Distribución de horas de primer contacto por aseguradora')),
+        ], None
 
+    @cached_view
+    def distribucion_de_recomendaciones_por_aseguradora(self):
         # fig = px.box(self.df, x='recomendacion', y='persona_edad', title='Distribución de recomendaciones por edad')
         # fig.add_annotation(**self.annotation)
         # fig.update_layout(**self.layout)
         # st.plotly_chart(fig)
 
-    def recomendacion_sunburst(self):
-        fig = px.sunburst(self.df_cleaned, path=['aseguradora', 'recomendacion', 'age_group', 'persona_genero'], title='Distribución de recomendaciones por aseguradora, edad y género')
-        fig.add_annotation(**self.annotation)
-        fig.update_layout(**self.layout)
-        st.plotly_chart(fig)
+        return [
+            lambda: self._styled(self._count_bar(x='recomendacion', color='aseguradora', title='Distribución de recomendaciones por aseguradora')),
+            lambda: self._styled(self._count_bar(x='recomendacion', color='age_group', title='Distribución de recomendaciones por grupo de edad')),
+            lambda: self._styled(self._box(x='recomendacion', y='persona_edad', color='aseguradora', title='Distribución de recomendaciones por edad y aseguradora')),
+        ], None
+
+    @cached_view
+    def recomendacion_sunburst(self, root=None):
+        """Sunburst of ``sunburst_depth`` levels below ``root`` (a node id, or the top when ``None``).
+
+        Returns the ids of the drawn nodes that have deeper levels to drill into.
+        """
+        nodes = self.aggregates.hierarchy(*self.SUNBURST_PATH)
+        centre = nodes[nodes['id'] == root]
+        if centre.empty:
+            root = None
+        root_depth = 0 if root is None else int(centre['depth'].iloc[0])
+
+        # Walk down from the root through the parent links, one level at a time
+        levels = []
+        frontier = [''] if root is None else [root]
+        for depth in range(root_depth + 1, root_depth + self.sunburst_depth + 1):
+            level = nodes[(nodes['depth'] == depth) & nodes['parent'].isin(frontier)]
+            levels.append(level)
+            frontier = level['id']
+        shown = pd.concat(levels, ignore_index=True)
+        title = 'Distribución de recomendaciones por aseguradora, edad y género'
+        if root is not None:
+            # The drilled node stays in the centre, so its total and path remain visible
+            shown = pd.concat([centre.assign(parent=''), shown], ignore_index=True)
+            title += f' ({node_path(root)})'
+        drillable = shown.loc[(shown['depth'] < len(self.SUNBURST_PATH)) & (shown['id'] != root), 'id'].tolist()
+
+        def sunburst_figure():
+            fig = go.Figure(go.Sunburst(
+                ids=shown['id'], labels=shown['label'], parents=shown['parent'], values=shown['count'],
+                branchvalues='total',
+            ))
+            fig.update_layout(title=title)
+            return self._styled(fig)
+
+        return [sunburst_figure], drillable
+
+    def sunburst_parent(self, node):
+        """Id of the parent of sunburst ``node``, or ``None`` at the top level."""
+        nodes = self.aggregates.hierarchy(*self.SUNBURST_PATH)
+        parent = nodes.loc[nodes['id'] == node, 'parent']
+        if parent.empty or parent.iloc[0] == '':
+            return None
+        return parent.iloc[0]
+
+    @cached_view
+    def tendencias(self, date_col='fecha_alta', freq='W'):
+        """Rows per ``freq`` period of ``date_col``, by aseguradora and by estado, from the daily rollups."""
+        title = f'{self.TREND_DATES[date_col]} por {self.TREND_PERIODS[freq]}'
+
+        def line_figure(by):
+            table = self.aggregates.trend(date_col, freq, [by])
+            fig = px.line(table, title=f'{title} y {by}')
+            fig.update_layout(xaxis_title=self.TREND_PERIODS[freq], yaxis_title='count')
+            return self._styled(fig)
+
+        return [lambda: line_figure('aseguradora'), lambda: line_figure('estado')], None
+
+    @cached_view
+    def actividad_por_dia_y_hora(self):
+        """Weekday by hour heatmap of every date column, from the weekday and hour rollups."""
+        def heatmap_figure(date_col):
+            fig = px.imshow(self.aggregates.weekday_hours(date_col), aspect='auto',
+                            labels=dict(x='hora', y='día', color='count'),
+                            title=f'{self.TREND_DATES[date_col]} por día de la semana y hora')
+            return self._styled(fig)
+
+        dates = [col for col in self.TREND_DATES if col in self.aggregates.hour_counts]
+        return [lambda date_col=date_col: heatmap_figure(date_col) for date_col in dates], None